@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_apscheduler',
     'taskbench.apps.TaskbenchConfig',
     'rest_framework',
@@ -71,6 +72,16 @@ DATABASES = {
     }
 }
 
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'taskbench.utils.authentication.JwtAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'EXCEPTION_HANDLER': 'taskbench.utils.exceptions.api_exception_handler',
+}
+
 SIMPLE_JWT = {
     'USER_ID_FIELD': 'user_id',
     'USER_ID_CLAIM': 'user_id',
@@ -138,11 +149,20 @@ LOGGING = {
             'level': 'WARNING',
             'propagate': False,
         },
+        # Изменения подписок фоновыми задачами (истечение и т.п.)
+        'subscription.audit': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     }
 }
 
 APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 APSCHEDULER_RUN_NOW_TIMEOUT = 25
+SCHEDULER_LOCK_KEY = int(os.environ.get("SCHEDULER_LOCK_KEY", 720_301))  # ключ advisory lock лидера manage.py run_scheduler
+SCHEDULER_HEARTBEAT_INTERVAL = int(os.environ.get("SCHEDULER_HEARTBEAT_INTERVAL", 10))  # секунды
+SCHEDULER_MISFIRE_GRACE = int(os.environ.get("SCHEDULER_MISFIRE_GRACE", 6 * 3600))  # на сколько секунд может опоздать ежедневная задача
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -155,3 +175,50 @@ SUBSCRIPTION_PRICE = 149.00
 SUBSCRIPTION_CURRENCY = "RUB"
 YOOKASSA_STORE_ID = os.environ.get("YOOKASSA_STORE_ID")
 YOOKASSA_AUTH_KEY = os.environ.get("YOOKASSA_AUTH_KEY")
+YOOKASSA_API_URL = os.environ.get("YOOKASSA_API_URL", "https://api.yookassa.ru/v3")  # scripts/yookassa_stub.py для локальных тестов
+YOOKASSA_HTTP_TIMEOUT = float(os.environ.get("YOOKASSA_HTTP_TIMEOUT", 10))  # секунды на один HTTP-запрос к ЮKassa
+RECURRING_CHARGE_WORKERS = int(os.environ.get("RECURRING_CHARGE_WORKERS", 8))  # параллельных запросов к ЮKassa
+RECURRING_CHARGE_BATCH_SIZE = int(os.environ.get("RECURRING_CHARGE_BATCH_SIZE", 100))  # подписок между сохранениями прогресса
+SUBSCRIPTION_EXPIRY_GRACE = int(os.environ.get("SUBSCRIPTION_EXPIRY_GRACE", 48 * 3600))  # секунды после end_date до деактивации, время на автосписание
+SUBSCRIPTION_EXPIRY_INTERVAL = int(os.environ.get("SUBSCRIPTION_EXPIRY_INTERVAL", 3600))  # секунды между проверками
+WEBHOOK_POLL_INTERVAL = int(os.environ.get("WEBHOOK_POLL_INTERVAL", 5))  # секунды между проверками очереди уведомлений ЮKassa
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", 100))  # уведомлений за один запуск обработчика
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", 5))  # после стольких ошибок уведомление остается в таблице для разбора
+WEBHOOK_RETENTION_DAYS = int(os.environ.get("WEBHOOK_RETENTION_DAYS", 30))  # сколько хранить обработанные уведомления
+
+# User.access_at копится в памяти процесса и записывается пачками (см. taskbench.services.access_service)
+ACCESS_AT_FLUSH_INTERVAL = int(os.environ.get("ACCESS_AT_FLUSH_INTERVAL", 30))  # секунды, 0 - писать сразу
+ACCESS_AT_GRANULARITY = int(os.environ.get("ACCESS_AT_GRANULARITY", 300))  # секунды, 0 - не пропускать запись
+
+# Кэш проверенных JWT в памяти процесса (см. taskbench.services.auth_cache_service)
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 10000))  # 0 - кэш выключен
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 300))  # секунды, но не дольше exp токена
+
+# Кэш подписок в памяти процесса (см. subscription.cache)
+ENTITLEMENT_CACHE_SIZE = int(os.environ.get("ENTITLEMENT_CACHE_SIZE", 10000))  # 0 - кэш выключен
+ENTITLEMENT_CACHE_TTL = int(os.environ.get("ENTITLEMENT_CACHE_TTL", 600))  # секунды, но не дольше end_date
+SUGGESTION_CACHE_SIZE = int(os.environ.get("SUGGESTION_CACHE_SIZE", 5000))  # ответов GigaChat в памяти процесса
+SUGGESTION_CACHE_TTL = int(os.environ.get("SUGGESTION_CACHE_TTL", 3600))  # секунды в памяти
+SUGGESTION_CACHE_DB_TTL = int(os.environ.get("SUGGESTION_CACHE_DB_TTL", 30 * 24 * 3600))  # секунды в таблице
+SUGGESTION_DEADLINE_CACHE_TTL = int(os.environ.get("SUGGESTION_DEADLINE_CACHE_TTL", 24 * 3600))  # сроки, зависящие от текущего времени
+SUGGESTION_MODE = os.environ.get("SUGGESTION_MODE", "separate")  # separate, combined или ab (см. suggestion.metrics.SuggestionMode)
+SUGGESTION_WORKERS = int(os.environ.get("SUGGESTION_WORKERS", 12))  # потоков для параллельных запросов к GigaChat в процессе
+SUGGESTION_TIMEOUT = float(os.environ.get("SUGGESTION_TIMEOUT", 10))  # секунды на все запросы одной подсказки
+SUGGESTION_COMPONENT_TIMEOUT = float(os.environ.get("SUGGESTION_COMPONENT_TIMEOUT", 8))  # секунды на один запрос с его начала
+
+TASK_BATCH_MAX_SIZE = int(os.environ.get("TASK_BATCH_MAX_SIZE", 100))  # задач в одном POST /tasks/batch/
+
+# GET /sync/ (см. taskbench.services.sync_service)
+SYNC_OVERLAP = int(os.environ.get("SYNC_OVERLAP", 10))  # секунды, на сколько раньше курсора повторно отдаются строки
+SYNC_TOMBSTONE_TTL_DAYS = int(os.environ.get("SYNC_TOMBSTONE_TTL_DAYS", 30))  # дни, сколько хранятся надгробия
+SYNC_CHUNK_SIZE = int(os.environ.get("SYNC_CHUNK_SIZE", 500))  # строк за одно чтение из базы
+
+STATISTICS_RANGE_MAX_DAYS = int(os.environ.get("STATISTICS_RANGE_MAX_DAYS", 3 * 366))  # GET /statistics/range/
+
+# Снимок метрик дашборда (см. dashboard.service)
+DASHBOARD_SNAPSHOT_INTERVAL = int(os.environ.get("DASHBOARD_SNAPSHOT_INTERVAL", 60))  # секунды
+# Итоги по задачам и подзадачам из статистики планировщика вместо COUNT(*), для очень больших таблиц
+DASHBOARD_ESTIMATE_COUNTS = os.environ.get("DASHBOARD_ESTIMATE_COUNTS", "false").lower() in ("1", "true", "yes")
+DASHBOARD_SERIES_TTL = int(os.environ.get("DASHBOARD_SERIES_TTL", 300))  # секунды, кэш временных рядов с текущим днем
+DASHBOARD_SERIES_MAX_DAYS = int(os.environ.get("DASHBOARD_SERIES_MAX_DAYS", 366))
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))  # строк за одно чтение при выгрузке CSV/NDJSON
@@ -1,13 +1,15 @@
 from django.urls import path, include
 
 from taskbench.views.category_views import CategoryListView, CategoryDetailView
-from taskbench.views.statistics_views import StatisticsView
+from taskbench.views.statistics_views import StatisticsView, StatisticsRangeView
+from taskbench.views.sync_views import SyncView
 from taskbench.views.subtask_views import (
     SubtaskCreateView,
     SubtaskDetailView
 )
 from taskbench.views.task_views import (
     TaskListView,
+    TaskBatchView,
     TaskDetailView,
 )
 from taskbench.views.user_views import (
@@ -24,6 +26,7 @@ urlpatterns = [
     path("", include("subscription.urls")),
     path("", include("suggestion.urls")),
     path('tasks/', TaskListView.as_view(), name='task_list'),
+    path('tasks/batch/', TaskBatchView.as_view(), name='task_batch'),
     path('tasks/<int:task_id>/', TaskDetailView.as_view(), name='task_detail'),
     path('subtasks/', SubtaskCreateView.as_view(), name='subtask_create'),
     path('subtasks/<int:subtask_id>/', SubtaskDetailView.as_view(), name='subtask_detail'),
@@ -35,5 +38,7 @@ urlpatterns = [
     path('user/password/', ChangePasswordView.as_view(), name='change_password'),
     path('token/refresh/', TokenRefreshView.as_view(), name="token_refresh"),
     path('statistics/', StatisticsView.as_view(), name='statistics'),
+    path('statistics/range/', StatisticsRangeView.as_view(), name='statistics_range'),
+    path('sync/', SyncView.as_view(), name='sync'),
 ]
 
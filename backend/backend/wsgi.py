@@ -5,3 +5,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Слушатель уведомлений (taskbench.utils.notifications) запускается в каждом воркере из post_worker_init
+# в gunicorn.conf.py: при preload_app этот модуль импортируется в мастере, и поток-слушатель с соединением
+# к базе оказался бы в процессе, от которого потом делается fork воркеров
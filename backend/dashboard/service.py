@@ -0,0 +1,309 @@
+import base64
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from backend import settings
+from taskbench.models.models import DashboardSnapshot, DailyCompletion, Subscription, Subtask, Task, User
+from taskbench.models.models import SchedulerHeartbeat, UserActivityDay
+
+logger = logging.getLogger(__name__)
+
+
+def estimated_counts(*models) -> dict:
+    """
+    Примерное количество строк по статистике планировщика (pg_class.reltuples), без чтения таблиц.
+    Значение обновляется ANALYZE/autovacuum. Для таблицы, которую еще не анализировали, возвращается None.
+    """
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s) AND relkind = 'r'",
+            [tables]
+        )
+        rows = dict(cursor.fetchall())
+    return {model: rows[table] if rows.get(table, -1) >= 0 else None for model, table in zip(models, tables)}
+
+
+def compute_metrics(estimate: bool = False) -> dict:
+    """
+    Метрики дашборда за четыре запроса (по одному на таблицу) с условной агрегацией COUNT(*) FILTER (WHERE ...).
+    estimate=True: итоги по задачам и подзадачам берутся из estimated_counts(), а задачи читаются только с начала недели.
+    """
+    now = timezone.localtime()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    start_of_week = today - timedelta(days=now.weekday())
+
+    data = User.objects.aggregate(
+        total_users=Count('user_id'),
+        new_users_week=Count('user_id', filter=Q(created_at__gte=start_of_week)),
+        new_users_today=Count('user_id', filter=Q(created_at__gte=today, created_at__lt=tomorrow)),
+        active_users_week=Count('user_id', filter=Q(access_at__gt=start_of_week)),
+        active_users_today=Count('user_id', filter=Q(access_at__gte=today, access_at__lt=tomorrow)),
+    )
+    data.update(Subscription.objects.aggregate(
+        total_subscribers=Count('user', distinct=True),
+        new_subs_week=Count('subscription_id', filter=Q(start_date__gt=start_of_week)),
+        new_subs_today=Count('subscription_id', filter=Q(start_date__gte=today, start_date__lt=tomorrow)),
+    ))
+
+    task_counts = {
+        'tasks_week': Count('task_id'),
+        'tasks_today': Count('task_id', filter=Q(created_at__gte=today, created_at__lt=tomorrow)),
+    }
+    estimates = estimated_counts(Task, Subtask) if estimate else {}
+    if estimates.get(Task) is not None:
+        data.update(Task.objects.filter(created_at__gte=start_of_week).aggregate(**task_counts))
+        data['total_tasks'] = estimates[Task]
+    else:
+        task_counts['tasks_week'] = Count('task_id', filter=Q(created_at__gte=start_of_week))
+        data.update(Task.objects.aggregate(total_tasks=Count('task_id'), **task_counts))
+    if estimates.get(Subtask) is not None:
+        data['total_subtasks'] = estimates[Subtask]
+    else:
+        data['total_subtasks'] = Subtask.objects.count()
+
+    return data
+
+
+def refresh_snapshot() -> DashboardSnapshot:
+    """Пересчитывает метрики и сохраняет снимок. Запускается планировщиком раз в DASHBOARD_SNAPSHOT_INTERVAL секунд."""
+    started = time.perf_counter()
+    estimate = settings.DASHBOARD_ESTIMATE_COUNTS
+    data = compute_metrics(estimate=estimate)
+    snapshot, _ = DashboardSnapshot.objects.update_or_create(
+        snapshot_id=1,
+        defaults={'data': data, 'created_at': timezone.now(), 'estimated': estimate},
+    )
+    logger.info(f"Dashboard snapshot refreshed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return snapshot
+
+
+def get_snapshot() -> DashboardSnapshot:
+    """
+    Последний снимок метрик. Если его нет или планировщик давно его не обновлял
+    (больше трех интервалов), снимок пересчитывается в этом запросе.
+    """
+    snapshot = DashboardSnapshot.objects.filter(snapshot_id=1).first()
+    max_age = timedelta(seconds=3 * settings.DASHBOARD_SNAPSHOT_INTERVAL)
+    if snapshot is None or snapshot.created_at < timezone.now() - max_age:
+        snapshot = refresh_snapshot()
+    return snapshot
+
+
+class SeriesCache:
+    """
+    Кэш временных рядов в памяти процесса, ключ - окно (first_day, last_day).
+    Окна, которые заканчиваются до сегодняшнего дня, уже не меняются и живут дольше.
+    """
+
+    def __init__(self, max_size: int, ttl: int, past_ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.past_ttl = past_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (first_day, last_day) -> (expires_at, data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, data):
+        ttl = self.past_ttl if key[1] < timezone.localdate() else self.ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+series_cache = SeriesCache(max_size=64, ttl=settings.DASHBOARD_SERIES_TTL, past_ttl=24 * 60 * 60)
+
+
+def _daily_counts(sql, first_day, last_day, params=()) -> list:
+    """
+    Выполняет запрос вида SELECT ... FROM generate_series(...) AS d LEFT JOIN ... GROUP BY d
+    и возвращает значения по дням, включая дни без строк.
+    """
+    start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(last_day, datetime.min.time()))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [start, end, *params])
+        return [count for _, count in cursor.fetchall()]
+
+
+def _created_per_day(model, column):
+    # BRIN по column отбрасывает блоки вне окна, поэтому план не зависит от размера таблицы
+    table = model._meta.db_table
+    return (
+        f'SELECT d, count(t.{column}) FROM generate_series(%s::timestamptz, %s::timestamptz, interval \'1 day\') AS d '
+        f'LEFT JOIN "{table}" AS t ON t.{column} >= d AND t.{column} < d + interval \'1 day\' '
+        f'GROUP BY d ORDER BY d'
+    )
+
+
+def _rows_per_day(model, value):
+    table = model._meta.db_table
+    return (
+        f'SELECT d, coalesce({value}, 0) FROM generate_series(%s::timestamptz, %s::timestamptz, interval \'1 day\') AS d '
+        f'LEFT JOIN "{table}" AS t ON t.day = d::date '
+        f'GROUP BY d ORDER BY d'
+    )
+
+
+def compute_time_series(first_day, last_day) -> dict:
+    """
+    Значения метрик по дням в промежутке [first_day, last_day], один запрос на метрику:
+    - signups: новые пользователи (User.created_at);
+    - tasks_created: созданные задачи (Task.created_at);
+    - tasks_completed: выполненные задачи (сумма DailyCompletion за день);
+    - active_users: пользователи, обращавшиеся к API (UserActivityDay);
+    - new_subscriptions: подписки по Subscription.start_date.
+    """
+    return {
+        'start': first_day.isoformat(),
+        'end': last_day.isoformat(),
+        'days': [(first_day + timedelta(days=i)).isoformat() for i in range((last_day - first_day).days + 1)],
+        'series': {
+            'signups': _daily_counts(_created_per_day(User, 'created_at'), first_day, last_day),
+            'tasks_created': _daily_counts(_created_per_day(Task, 'created_at'), first_day, last_day),
+            'tasks_completed': _daily_counts(_rows_per_day(DailyCompletion, 'sum(t.count)'), first_day, last_day),
+            'active_users': _daily_counts(_rows_per_day(UserActivityDay, 'count(t.user_id)'), first_day, last_day),
+            'new_subscriptions': _daily_counts(_created_per_day(Subscription, 'start_date'), first_day, last_day),
+        },
+    }
+
+
+def get_time_series(first_day, last_day) -> dict:
+    key = (first_day, last_day)
+    data = series_cache.get(key)
+    if data is None:
+        data = compute_time_series(first_day, last_day)
+        series_cache.put(key, data)
+    return data
+
+
+def encode_subscription_cursor(subscription) -> str:
+    data = {'d': subscription.start_date.isoformat(), 'id': subscription.subscription_id}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_subscription_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(data['d']), int(data['id'])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor')
+
+
+def filter_subscriptions(is_active=None, email=None, start_from=None, start_to=None):
+    """
+    Подписки с фильтрами списка в дашборде. Каждый фильтр обслуживается индексом:
+    is_active - subscription_active_start_idx, email (начало, без учета регистра) - user_email_prefix_idx,
+    промежуток start_date - subscription_start_idx.
+    """
+    subscriptions = Subscription.objects.all()
+    if is_active is not None:
+        subscriptions = subscriptions.filter(is_active=is_active)
+    if email:
+        subscriptions = subscriptions.filter(user__email__istartswith=email)
+    if start_from is not None:
+        subscriptions = subscriptions.filter(start_date__gte=start_from)
+    if start_to is not None:
+        subscriptions = subscriptions.filter(start_date__lt=start_to)
+    return subscriptions
+
+
+def approximate_count(queryset, exact_below: int = 1000) -> int:
+    """
+    Примерное количество строк по оценке планировщика (EXPLAIN), без выполнения запроса.
+    Небольшие результаты (меньше exact_below по оценке) считаются точно - это дешево.
+    """
+    if not queryset.query.where:
+        estimate = estimated_counts(queryset.model)[queryset.model]
+    else:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        estimate = plan[0]['Plan']['Plan Rows']
+    if estimate is None or estimate < exact_below:
+        return queryset.count()
+    return estimate
+
+
+def get_subscription_page(subscriptions, cursor=None, page_size=10):
+    """
+    Страница подписок по ключу (start_date, subscription_id) в порядке убывания.
+    Время ответа не зависит от номера страницы: вместо OFFSET - условие "меньше ключа последней строки".
+    Условие записано сравнением строк (start_date, subscription_id) < (...): оба столбца индекса
+    subscription_start_idx убывают, поэтому PostgreSQL начинает чтение индекса сразу с позиции курсора
+    (Index Cond), а не отбрасывает фильтром все предыдущие строки, как при OR из двух условий.
+    Возвращает (подписки, курсор следующей страницы или None).
+    """
+    if cursor:
+        start_date, subscription_id = decode_subscription_cursor(cursor)
+        table = Subscription._meta.db_table
+        subscriptions = subscriptions.extra(
+            where=[f'("{table}"."start_date", "{table}"."subscription_id") < (%s, %s)'],
+            params=[start_date, subscription_id]
+        )
+    page = list(
+        subscriptions.select_related('user').order_by('-start_date', '-subscription_id')[:page_size + 1]
+    )
+    next_cursor = encode_subscription_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+
+SUBSCRIPTION_EXPORT_FIELDS = ['subscription_id', 'user__email', 'start_date', 'end_date', 'is_active',
+                              'latest_yookassa_payment_id', 'yookassa_payment_method_id']
+USER_EXPORT_FIELDS = ['user_id', 'email', 'created_at', 'access_at']
+
+
+def export_rows(queryset, fields):
+    """
+    Строки для выгрузки, читаются из базы пачками по EXPORT_CHUNK_SIZE через серверный курсор.
+    Вне транзакции Django объявляет курсор WITH HOLD: транзакция, в которой он создан, сразу завершается,
+    поэтому долгая выгрузка не держит снимок и не мешает VACUUM. Внутри atomic() так бы не получилось.
+    """
+    if not connection.get_autocommit():
+        raise RuntimeError('Export must not run inside a transaction')
+    yield from queryset.values_list(*fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def export_subscriptions(subscriptions):
+    return export_rows(subscriptions.order_by('subscription_id'), SUBSCRIPTION_EXPORT_FIELDS)
+
+
+def export_users():
+    return export_rows(User.objects.order_by('user_id'), USER_EXPORT_FIELDS)
+
+
+def scheduler_status() -> list:
+    """
+    Процессы планировщика по последнему heartbeat. Процесс считается пропавшим (stale),
+    если не отмечался дольше трех интервалов; если нет живого лидера, задачи по расписанию не выполняются.
+    """
+    threshold = timezone.now() - timedelta(seconds=3 * settings.SCHEDULER_HEARTBEAT_INTERVAL)
+    return [
+        {**row, 'stale': row['heartbeat_at'] < threshold}
+        for row in SchedulerHeartbeat.objects.order_by('-is_leader', 'instance').values()
+    ]
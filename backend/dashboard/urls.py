@@ -1,5 +1,6 @@
 from django.urls import path
-from dashboard.views import custom_login, dashboard_view, stats_api, subscription_list_api, subscription_page
+from dashboard.views import custom_login, dashboard_view, stats_api, subscription_list_api, subscription_page, \
+    cache_stats_api, time_series_api, export_subscriptions_api, export_users_api, scheduler_status_api
 
 urlpatterns = [
     path("admin/login/", custom_login, name="custom_login"),
@@ -7,4 +8,9 @@ urlpatterns = [
     path("admin/subscriptions/", subscription_page, name="admin_subscriptions"),
     path("admin/dashboard/stats/", stats_api, name="stats_api"),
     path("admin/api/subscriptions/", subscription_list_api, name="subscription_list_api"),
+    path("admin/api/cache-stats/", cache_stats_api, name="cache_stats_api"),
+    path("admin/api/scheduler/", scheduler_status_api, name="scheduler_status_api"),
+    path("admin/api/time-series/", time_series_api, name="time_series_api"),
+    path("admin/api/export/subscriptions/", export_subscriptions_api, name="export_subscriptions_api"),
+    path("admin/api/export/users/", export_users_api, name="export_users_api"),
 ]
@@ -1,13 +1,23 @@
-from datetime import timedelta
+import csv
+import json
+import os
+from datetime import date, datetime, timedelta
 from django.utils import timezone
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.core.paginator import Paginator
-from django.http import HttpResponseForbidden, JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.views.decorators.csrf import csrf_protect
 
-from taskbench.models.models import Subscription, Subtask, Task, User
+from backend import settings
+from dashboard.service import get_snapshot, get_time_series, series_cache, scheduler_status
+from dashboard.service import filter_subscriptions, get_subscription_page, approximate_count
+from dashboard.service import export_subscriptions, export_users, SUBSCRIPTION_EXPORT_FIELDS, USER_EXPORT_FIELDS
+from subscription.cache import entitlement_cache
+from suggestion.cache import suggestion_cache
+from suggestion.metrics import suggestion_metrics
+from taskbench.services.auth_cache_service import token_cache
 
 
 @csrf_protect
@@ -38,35 +48,75 @@ def subscription_page(request):
 @user_passes_test(lambda u: u.is_staff)
 def stats_api(request):
     if request.method == "GET":
-        now = timezone.now()
-        today = now.date()
-        start_of_week = now - timedelta(days=now.weekday())
-        start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-
+        # Снимок обновляется планировщиком, здесь только одно чтение
+        snapshot = get_snapshot()
         data = {
-            "total_users": User.objects.all().count(),
-            "total_subscribers": Subscription.objects.values('user').distinct().count(),
-            "new_users_week": User.objects.filter(created_at__gte=start_of_week).count(),
-            "new_users_today": User.objects.filter(created_at__date=today).count(),
-            "new_subs_week": Subscription.objects.filter(start_date__gt=start_of_week).count(),
-            "new_subs_today": Subscription.objects.filter(start_date__date=today).count(),
-            "active_users_week": User.objects.filter(access_at__gt=start_of_week).count(),
-            "active_users_today": User.objects.filter(access_at__date=today).count(),
-            "total_tasks": Task.objects.all().count(),
-            "tasks_week": Task.objects.filter(created_at__gte=start_of_week).count(),
-            "tasks_today": Task.objects.filter(created_at__date=today).count(),
-            "total_subtasks": Subtask.objects.all().count(),
+            **snapshot.data,
+            "generated_at": snapshot.created_at.isoformat(),
+            "estimated": snapshot.estimated,
         }
         return JsonResponse(data)
 
+@user_passes_test(lambda u: u.is_staff)
+def cache_stats_api(request):
+    """Счетчики кэшей в памяти процесса, который обработал запрос."""
+    return JsonResponse({
+        "pid": os.getpid(),
+        "token_cache": token_cache.stats(),
+        "series_cache": series_cache.stats(),
+        "entitlement_cache": entitlement_cache.stats(),
+        "suggestion_cache": suggestion_cache.stats(),
+        "suggestion_modes": suggestion_metrics.stats(),
+    })
+
+@user_passes_test(lambda u: u.is_staff)
+def scheduler_status_api(request):
+    """Heartbeat процессов manage.py run_scheduler: кто лидер, когда отмечался, сколько задач выполнено."""
+    instances = scheduler_status()
+    return JsonResponse({
+        "leader": next((row["instance"] for row in instances if row["is_leader"] and not row["stale"]), None),
+        "instances": instances,
+    })
+
+@user_passes_test(lambda u: u.is_staff)
+def time_series_api(request):
+    """
+    GET admin/api/time-series/?start=2025-05-01&end=2025-05-31
+    Значения метрик по дням за промежуток (по умолчанию последние 30 дней), см. dashboard.service.compute_time_series.
+    """
+    try:
+        end = date.fromisoformat(request.GET["end"]) if "end" in request.GET else timezone.localdate()
+        start = date.fromisoformat(request.GET["start"]) if "start" in request.GET else end - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({"error": "Invalid date"}, status=400)
+    if start > end or (end - start).days >= settings.DASHBOARD_SERIES_MAX_DAYS:
+        return JsonResponse({"error": f"Invalid range (max {settings.DASHBOARD_SERIES_MAX_DAYS} days)"}, status=400)
+
+    return JsonResponse(get_time_series(start, end))
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+def _filtered_subscriptions(params):
+    """Подписки с фильтрами из GET-параметров is_active, email, start_from, start_to. ValueError/KeyError - неверный параметр."""
+    is_active = {"true": True, "false": False}[params["is_active"]] if params.get("is_active") else None
+    start_from = _day_start(date.fromisoformat(params["start_from"])) if params.get("start_from") else None
+    start_to = _day_start(date.fromisoformat(params["start_to"]) + timedelta(days=1)) if params.get("start_to") else None
+    return filter_subscriptions(is_active, params.get("email", "").strip(), start_from, start_to)
+
 @user_passes_test(lambda u: u.is_staff)
 def subscription_list_api(request):
-    page_number = request.GET.get("page", 1)
+    """
+    GET admin/api/subscriptions/?cursor=<next_cursor>&is_active=true&email=ivan&start_from=2025-01-01&start_to=2025-02-01
+    Постраничный вывод по курсору, все фильтры необязательные. approx_total считается только для первой страницы.
+    """
     page_size = 10  # кол-во подписок на страницу
-
-    subscriptions = Subscription.objects.select_related("user").order_by("-start_date")
-    paginator = Paginator(subscriptions, page_size)
-    page = paginator.get_page(page_number)
+    params = request.GET
+    try:
+        subscriptions = _filtered_subscriptions(params)
+        page, next_cursor = get_subscription_page(subscriptions, params.get("cursor"), page_size)
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Invalid parameters"}, status=400)
 
     data = {
         "subscriptions": [
@@ -78,12 +128,64 @@ def subscription_list_api(request):
                 "is_active": sub.is_active,
                 "transaction_id": sub.latest_yookassa_payment_id or "-",
             }
-            for sub in page.object_list
+            for sub in page
         ],
-        "page": page.number,
-        "total_pages": paginator.num_pages,
-        "has_next": page.has_next(),
-        "has_previous": page.has_previous(),
+        "next_cursor": next_cursor,
+        "has_next": next_cursor is not None,
     }
+    if not params.get("cursor"):
+        data["approx_total"] = approximate_count(subscriptions)
+
+    return JsonResponse(data)
+
+class _Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку (см. документацию Django о потоковом CSV)."""
+    def write(self, value):
+        return value
+
+def _export_response(rows, header, export_format, filename):
+    """
+    Потоковая выгрузка в CSV или NDJSON: строки отправляются клиенту по мере чтения из базы,
+    поэтому память не зависит от размера таблицы.
+    """
+    if export_format == "ndjson":
+        content = (json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n" for row in rows)
+        content_type = "application/x-ndjson"
+    else:
+        writer = csv.writer(_Echo())
+        content = (writer.writerow(row) for row in _with_header(header, rows))
+        content_type = "text/csv; charset=utf-8"
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    return response
 
-    return JsonResponse(data)
\ No newline at end of file
+def _with_header(header, rows):
+    yield header
+    yield from rows
+
+@user_passes_test(lambda u: u.is_staff)
+def export_subscriptions_api(request):
+    """
+    GET admin/api/export/subscriptions/?format=csv|ndjson
+    Все подписки с email пользователя, те же фильтры, что и в subscription_list_api.
+    """
+    export_format = request.GET.get("format", "csv")
+    if export_format not in ("csv", "ndjson"):
+        return JsonResponse({"error": "Invalid format"}, status=400)
+    try:
+        subscriptions = _filtered_subscriptions(request.GET)
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Invalid parameters"}, status=400)
+    header = [field.replace("user__", "") for field in SUBSCRIPTION_EXPORT_FIELDS]
+    return _export_response(export_subscriptions(subscriptions), header, export_format, "subscriptions")
+
+@user_passes_test(lambda u: u.is_staff)
+def export_users_api(request):
+    """
+    GET admin/api/export/users/?format=csv|ndjson
+    Пользователи с датами регистрации и последнего обращения.
+    """
+    export_format = request.GET.get("format", "csv")
+    if export_format not in ("csv", "ndjson"):
+        return JsonResponse({"error": "Invalid format"}, status=400)
+    return _export_response(export_users(), USER_EXPORT_FIELDS, export_format, "users")
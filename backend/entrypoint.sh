@@ -12,4 +12,4 @@ echo "Marking container as ready..."
 touch /tmp/app_ready
 
 echo "Starting Gunicorn..."
-exec gunicorn --bind 0.0.0.0:8000 --workers 3 backend.wsgi:application
+exec gunicorn -c gunicorn.conf.py backend.wsgi:application
@@ -0,0 +1,51 @@
+# Настройки gunicorn: entrypoint.sh запускает gunicorn -c gunicorn.conf.py backend.wsgi:application
+# Приложение загружается в мастере (preload_app), там же загружаются данные dateparser,
+# а воркеры после fork получают их copy-on-write и сами создают клиент GigaChat.
+# Время прогрева и память каждого процесса пишутся в лог gunicorn.
+
+import gc
+import os
+import resource
+import time
+
+bind = "0.0.0.0:8000"
+workers = int(os.environ.get("GUNICORN_WORKERS", 3))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def memory_usage() -> str:
+    """RSS и PSS процесса. PSS делит общие с мастером страницы между процессами, поэтому показывает выигрыш от preload."""
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            fields = dict(line.split(":", 1) for line in smaps if line.startswith(("Rss:", "Pss:")))
+        return f"RSS {int(fields['Rss'].split()[0]) // 1024} MB, PSS {int(fields['Pss'].split()[0]) // 1024} MB"
+    except (OSError, KeyError, ValueError):
+        return f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from suggestion.warmup import preload_dateparser
+
+    elapsed = preload_dateparser()
+    # Объекты, созданные до fork, не трогает сборщик мусора, и их страницы дольше остаются общими
+    gc.freeze()
+    server.log.info(f"Master warm-up: dateparser {elapsed:.2f} s, {memory_usage()}")
+
+
+def post_worker_init(worker):
+    from suggestion.warmup import init_suggestion_service, preload_dateparser
+    from taskbench.utils import notifications
+
+    started = time.perf_counter()
+    # Без preload данные dateparser загружаются в каждом воркере, с preload вызов уже быстрый
+    dateparser_elapsed = preload_dateparser()
+    client_elapsed = init_suggestion_service()
+    # Слушатель уведомлений - только в воркерах, не в мастере (см. backend/wsgi.py)
+    notifications.enable()
+    client = f"{client_elapsed:.2f} s" if client_elapsed is not None else "failed"
+    worker.log.info(
+        f"Worker {worker.pid} warm-up {time.perf_counter() - started:.2f} s "
+        f"(dateparser {dateparser_elapsed:.2f} s, GigaChat {client}), {memory_usage()}"
+    )
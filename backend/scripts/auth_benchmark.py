@@ -0,0 +1,73 @@
+# Сравнение старой и новой аутентификации запросов.
+# Запуск из папки backend: python scripts/auth_benchmark.py [кол-во итераций]
+# Работает на временной тестовой базе, рабочие данные не трогает.
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+django.setup()
+
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from taskbench.models.models import User
+from taskbench.serializers.user_serializers import JwtSerializer
+from taskbench.utils.authentication import JwtAuthentication
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+
+def legacy_get_user(token):
+    """Так пользователь определялся раньше в каждом сервисе: сериализатор + полный save()."""
+    serializer = JwtSerializer(data=token)
+    serializer.is_valid()
+    user = serializer.validated_data['user']
+    user.access_at = timezone.now()
+    user.save()
+    return user
+
+
+def measure(name, func):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(ITERATIONS):
+            func()
+        elapsed = time.perf_counter() - started
+    print(f"{name:<36} {elapsed / ITERATIONS * 1e6:>10.1f} мкс/запрос {len(queries) / ITERATIONS:>6.2f} SQL/запрос")
+
+
+def main():
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create(email="benchmark@example.com")
+        user.set_password("benchmark_password")
+        user.save()
+        access = str(RefreshToken.for_user(user).access_token)
+        header = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+
+        request = RequestFactory().get("/categories/", **header)
+        authenticator = JwtAuthentication()
+        client = Client()
+
+        print(f"Итераций: {ITERATIONS}")
+        measure("JwtSerializer + User.save()", lambda: legacy_get_user({'token': access}))
+        measure("JwtAuthentication.authenticate()", lambda: authenticator.authenticate(request))
+        measure("GET /categories/", lambda: client.get("/categories/", **header))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Время ежедневного автосписания: старый последовательный цикл и новый пакетный с пулом потоков.
+# Запуск из папки backend при работающей заглушке (python scripts/yookassa_stub.py):
+#   python scripts/charge_benchmark.py [кол-во подписок] [адрес заглушки]
+# Работает на временной тестовой базе, рабочие данные не трогает.
+
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+os.environ.setdefault("YOOKASSA_API_URL", sys.argv[2] if len(sys.argv) > 2 else "http://127.0.0.1:8765/v3")
+os.environ.setdefault("YOOKASSA_STORE_ID", "benchmark")
+os.environ.setdefault("YOOKASSA_AUTH_KEY", "benchmark")
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from backend import settings
+from subscription.service import create_payment_without_confirmation
+from subscription.tasks import charge_recurring_subscriptions
+from taskbench.models.models import Subscription, User
+
+SUBSCRIPTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+
+def seed():
+    Subscription.objects.all().delete()
+    User.objects.filter(email__startswith='charge').delete()
+    now = timezone.now()
+    users = User.objects.bulk_create(
+        [User(email=f'charge{i}@example.com', password_hash='') for i in range(SUBSCRIPTIONS)]
+    )
+    Subscription.objects.bulk_create([
+        Subscription(user=user, is_active=True, start_date=now - timedelta(days=31), end_date=now - timedelta(days=1),
+                     yookassa_payment_method_id=f'pm-{user.user_id}')
+        for user in users
+    ])
+
+
+def legacy_charge():
+    """Так автосписание выполнялось раньше: по одной подписке, пользователь отдельным запросом."""
+    subscriptions = Subscription.objects.filter(
+        is_active=True, yookassa_payment_method_id__isnull=False, end_date__lte=timezone.now().date()
+    ).exclude(yookassa_payment_method_id__exact='')
+    for sub in subscriptions:
+        try:
+            create_payment_without_confirmation(sub, f"Продление ежемесячной подписки для {sub.user.email}",
+                                                sub.yookassa_payment_method_id)
+        except Exception:
+            sub.deactivate()
+
+
+def measure(name, func):
+    seed()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    print(f"{name:<40} {elapsed:>8.2f} с {SUBSCRIPTIONS / elapsed:>8.1f} подписок/с {len(queries):>6} SQL")
+
+
+def main():
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f"Подписок: {SUBSCRIPTIONS}, API: {settings.YOOKASSA_API_URL}")
+        measure("Последовательно", legacy_charge)
+        measure(f"Пул {settings.RECURRING_CHARGE_WORKERS} потоков, пачки "
+                f"{settings.RECURRING_CHARGE_BATCH_SIZE}", charge_recurring_subscriptions)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    main()
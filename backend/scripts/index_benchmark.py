@@ -0,0 +1,116 @@
+# Планы и время запросов списка задач и статистики без индексов из 0007 и с ними.
+# Запуск из папки backend: python scripts/index_benchmark.py [кол-во пользователей] [задач на пользователя]
+# Данные генерируются во временной тестовой базе, рабочие данные не трогает.
+
+import os
+import re
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from taskbench.models.models import Task, User
+from taskbench.services.statistics_service import completed_tasks_by_day
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+TASKS_PER_USER = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+REPEAT = 20
+
+
+def seed():
+    """Пользователи и задачи: около трети выполнены за последний год, у части открытых нет дедлайна."""
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {User._meta.db_table} (email, password_hash, created_at, access_at)
+            SELECT 'bench' || u || '@example.com', '', now(), now() FROM generate_series(1, %s) AS u
+            """,
+            [USERS]
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {Task._meta.db_table}
+                (title, deadline, priority, is_completed, created_at, completed_at, ai_processed, user_id)
+            SELECT 'Task ' || t,
+                   CASE WHEN random() < 0.2 THEN NULL ELSE now() + random() * interval '90 days' END,
+                   (random() * 5)::int,
+                   done,
+                   now() - interval '1 year',
+                   CASE WHEN done THEN now() - random() * interval '365 days' END,
+                   false,
+                   user_id
+            FROM (
+                SELECT u.user_id, t, random() < 0.35 AS done
+                FROM {User._meta.db_table} AS u CROSS JOIN generate_series(1, %s) AS t
+            ) AS tasks
+            """,
+            [TASKS_PER_USER]
+        )
+        cursor.execute(f"ANALYZE {User._meta.db_table}, {Task._meta.db_table}")
+    print(f"Сгенерировано {USERS} пользователей и {USERS * TASKS_PER_USER} задач "
+          f"за {time.perf_counter() - started:.1f} с")
+
+
+def queries(user):
+    today = timezone.now().date()
+    open_tasks = Task.objects.filter(user=user, is_completed=False)
+    return {
+        "GET /tasks/?sort_by=priority": open_tasks.order_by('-priority', 'deadline', 'task_id')[:10],
+        "GET /tasks/?sort_by=deadline": open_tasks.order_by('deadline', '-priority', 'task_id')[:10],
+        "GET /statistics/": completed_tasks_by_day(user, today - timedelta(days=today.weekday()), today),
+    }
+
+
+def run(title, user):
+    print(f"\n===== {title} =====")
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Task._meta.db_table}")
+    for name, queryset in queries(user).items():
+        plan = queryset.explain(analyze=True, buffers=True)
+        timings = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter() - started)
+        execution = re.search(r"Execution Time: ([\d.]+) ms", plan)
+        print(f"\n--- {name}: EXPLAIN {execution.group(1) if execution else '?'} мс, "
+              f"медиана {sorted(timings)[REPEAT // 2] * 1000:.2f} мс")
+        print(plan)
+
+
+def main():
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        seed()
+        user = User.objects.order_by('user_id').first()
+        indexes = Task._meta.indexes
+
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Task, index)
+        run("Без индексов", user)
+
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(Task, index)
+        run("С индексами", user)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    main()
@@ -38,10 +38,7 @@ def create_category(token, name):
     return response.json()
 
 
-def create_task(token, content, deadline, priority, category_id=None):
-    url = f"{BASE_URL}/tasks/"
-    headers = {"Authorization": f"Bearer {token}"}
-
+def task_data(content, deadline, priority, category_id=None):
     dpc = {
         "deadline": deadline,
         "priority": priority
@@ -49,7 +46,7 @@ def create_task(token, content, deadline, priority, category_id=None):
     if category_id:
         dpc["category_id"] = category_id
 
-    data = {
+    return {
         "content": content,
         "dpc": dpc,
         "subtasks": [
@@ -57,7 +54,12 @@ def create_task(token, content, deadline, priority, category_id=None):
             {"content": f"Подзадача 2 для {content}"}
         ]
     }
-    response = requests.post(url, headers=headers, json=data)
+
+
+def create_tasks(token, tasks):
+    url = f"{BASE_URL}/tasks/batch/"
+    headers = {"Authorization": f"Bearer {token}"}
+    response = requests.post(url, headers=headers, json={"tasks": tasks})
     return response.json()
 
 
@@ -108,22 +110,17 @@ def main():
             categories.append(cat_response)
             print(f"Создана категория: {cat_name} (ID: {cat_response.get('id')})")
 
-        # Создаем задачи
-        tasks = []
+        # Создаем задачи одним запросом
+        tasks_data = []
         for j in range(1, 4):
             deadline = (datetime.now() + timedelta(days=j)).isoformat() + "Z"
             task_content = f"Задача {j} пользователя {i}"
             cat_id = categories[j - 1]["id"] if j <= len(categories) else None
+            tasks_data.append(task_data(task_content, deadline=deadline, priority=j, category_id=cat_id))
 
-            task_response = create_task(
-                token,
-                content=task_content,
-                deadline=deadline,
-                priority=j,
-                category_id=cat_id
-            )
-            tasks.append(task_response)
-            print(f"Создана задача: {task_content} (ID: {task_response.get('id')})")
+        tasks = create_tasks(token, tasks_data)
+        for task in tasks:
+            print(f"Создана задача: {task['content']} (ID: {task['id']})")
 
         # Создаем дополнительные подзадачи
         if tasks:
@@ -0,0 +1,84 @@
+# Локальная замена API ЮKassa для проверки и замеров автосписаний без сети.
+# Запуск из папки backend: python scripts/yookassa_stub.py [порт] [задержка ответа, мс] [доля отказов 0..1]
+# В .env: YOOKASSA_API_URL=http://127.0.0.1:8765/v3 (store id и ключ могут быть любыми).
+# Повторный запрос с тем же Idempotence-Key возвращает тот же платеж, как настоящий API.
+
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+LATENCY = (int(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000
+FAILURE_RATE = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+
+_payments = {}  # Idempotence-Key -> ответ
+_lock = threading.Lock()
+_stats = {'requests': 0, 'created': 0, 'replayed': 0}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.rstrip('/') != '/v3/payments':
+            return self._reply(404, {'type': 'error', 'code': 'not_found'})
+
+        time.sleep(LATENCY)
+        key = self.headers.get('Idempotence-Key') or str(uuid.uuid4())
+        with _lock:
+            _stats['requests'] += 1
+            payment = _payments.get(key)
+            if payment is not None:
+                _stats['replayed'] += 1
+                return self._reply(200, payment)
+            if random.random() < FAILURE_RATE:
+                return self._reply(400, {'type': 'error', 'code': 'invalid_request',
+                                         'description': 'Stub: payment method declined'})
+            payment = {
+                'id': str(uuid.uuid4()),
+                'status': 'succeeded' if body.get('payment_method_id') else 'pending',
+                'paid': bool(body.get('payment_method_id')),
+                'amount': body.get('amount'),
+                'description': body.get('description'),
+                'metadata': body.get('metadata', {}),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'test': True,
+                'refundable': False,
+            }
+            _payments[key] = payment
+            _stats['created'] += 1
+        self._reply(200, payment)
+
+    def do_GET(self):
+        with _lock:
+            self._reply(200, dict(_stats))
+
+    def _reply(self, code, data):
+        payload = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', PORT), Handler)
+    print(f"Заглушка ЮKassa на http://127.0.0.1:{PORT}/v3, задержка {LATENCY * 1000:.0f} мс, отказы {FAILURE_RATE:.0%}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
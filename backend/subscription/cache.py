@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend import settings
+from taskbench.models.models import Subscription
+from taskbench.utils import notifications
+
+INVALIDATION_CHANNEL = 'taskbench_entitlement_invalidate'
+
+_SUBSCRIPTION_FIELDS = [field.attname for field in Subscription._meta.concrete_fields]
+
+
+class EntitlementCache:
+    """
+    Кэш подписок пользователей в памяти процесса: user_id -> снимок полей Subscription (или None, если подписки нет).
+    По end_date из снимка пользователь считается подписанным до этого момента без запросов к базе.
+    Запись сбрасывается при activate/renew_subscription/deactivate (во всех процессах через notifications),
+    живет не дольше ttl секунд и не дольше end_date.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (expires_at, snapshot)
+
+    def get(self, user_id: int):
+        """Возвращает (True, Subscription | None) при попадании и (False, None) при промахе."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.time():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            snapshot = entry[1]
+        if snapshot is None:
+            return True, None
+        return True, Subscription.from_db('default', _SUBSCRIPTION_FIELDS, [snapshot[name] for name in _SUBSCRIPTION_FIELDS])
+
+    def put(self, user_id: int, subscription: Subscription | None):
+        if self.max_size <= 0:
+            return
+        now = time.time()
+        expires_at = now + self.ttl
+        snapshot = None
+        if subscription is not None:
+            snapshot = {name: getattr(subscription, name) for name in _SUBSCRIPTION_FIELDS}
+            if subscription.end_date is not None and subscription.end_date.timestamp() > now:
+                expires_at = min(expires_at, subscription.end_date.timestamp())
+        with self._lock:
+            self._entries[user_id] = (expires_at, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+entitlement_cache = EntitlementCache(max_size=settings.ENTITLEMENT_CACHE_SIZE, ttl=settings.ENTITLEMENT_CACHE_TTL)
+
+
+def get_entitlement(user) -> Subscription | None:
+    """Подписка пользователя из кэша, при промахе - один запрос."""
+    found, subscription = entitlement_cache.get(user.user_id)
+    if not found:
+        subscription = (
+            Subscription.objects
+            .filter(user_id=user.user_id)
+            .order_by(F('end_date').desc(nulls_last=True))
+            .first()
+        )
+        entitlement_cache.put(user.user_id, subscription)
+    return subscription
+
+
+def is_entitled(subscription: Subscription | None) -> bool:
+    return subscription is not None and subscription.end_date is not None and subscription.end_date > timezone.now()
+
+
+def invalidate_entitlement(user_id: int):
+    """
+    Сбрасывает кэш подписки пользователя во всех процессах.
+    NOTIFY доходит до других процессов только после коммита, а в этом процессе запись сбрасывается сразу
+    и еще раз после коммита - на случай, если до коммита кто-то успел закэшировать старые данные.
+    """
+    notifications.publish(INVALIDATION_CHANNEL, str(user_id))
+    transaction.on_commit(lambda: entitlement_cache.invalidate_user(user_id))
+
+
+def invalidate_entitlements(user_ids):
+    """Сбрасывает кэш подписок многих пользователей: id передаются через запятую, по NOTIFY на пачку."""
+    user_ids = list(user_ids)
+    # NOTIFY ограничен 8000 байт, 500 id с запятыми помещаются с запасом
+    for first in range(0, len(user_ids), 500):
+        chunk = user_ids[first:first + 500]
+        notifications.publish(INVALIDATION_CHANNEL, ','.join(map(str, chunk)))
+        transaction.on_commit(lambda chunk=chunk: [entitlement_cache.invalidate_user(user_id) for user_id in chunk])
+
+
+def _on_invalidate(payload):
+    if payload is None:
+        entitlement_cache.clear()
+    else:
+        for user_id in payload.split(','):
+            entitlement_cache.invalidate_user(int(user_id))
+
+
+notifications.subscribe(INVALIDATION_CHANNEL, _on_invalidate)
@@ -0,0 +1,33 @@
+"""
+Payment из SDK ЮKassa с ограничением времени HTTP-запроса.
+ApiClient SDK не передает timeout в requests (Configuration.timeout - это только пауза между повторами),
+поэтому зависший ответ ЮKassa мог бы держать поток и открытую транзакцию сколько угодно.
+"""
+
+from requests.adapters import HTTPAdapter
+from yookassa import Payment as YooKassaPayment
+from yookassa.client import ApiClient
+
+from backend.settings import YOOKASSA_HTTP_TIMEOUT
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = YOOKASSA_HTTP_TIMEOUT
+        return super().send(request, **kwargs)
+
+
+class TimeoutApiClient(ApiClient):
+    def get_session(self):
+        session = super().get_session()
+        adapter = TimeoutHTTPAdapter(max_retries=session.get_adapter('https://').max_retries)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+class Payment(YooKassaPayment):
+    def __init__(self):
+        super().__init__()
+        self.client = TimeoutApiClient()
@@ -20,7 +20,7 @@ def status_response(is_subscribed, subscription, user, status):
             'is_subscribed': is_subscribed,
             'user_id': user.user_id,
             'next_payment': subscription.end_date.replace(tzinfo=None).isoformat(
-                timespec='seconds'),
+                timespec='seconds') if subscription.end_date is not None else None,
             'is_active': subscription.is_active,
             'subscription_id': subscription.subscription_id
         } if subscription is not None else
@@ -1,8 +1,11 @@
+import json
 import logging
 import uuid
 
+from django.db import connection
 from django.utils import timezone
-from yookassa import Configuration, Payment
+from rest_framework.exceptions import ValidationError
+from yookassa import Configuration
 from yookassa.domain.notification import WebhookNotificationFactory, WebhookNotificationEventType
 
 from backend.settings import (
@@ -10,17 +13,23 @@ from backend.settings import (
     SUBSCRIPTION_CURRENCY,
     SERVER_HOST,
     YOOKASSA_STORE_ID,
-    YOOKASSA_AUTH_KEY
+    YOOKASSA_AUTH_KEY,
+    YOOKASSA_API_URL
 )
-from taskbench.models.models import Subscription
-from taskbench.services.user_service import get_user
+from subscription.cache import get_entitlement, is_entitled
+from subscription.client import Payment
+from taskbench.models.models import Subscription, WebhookEvent
 from taskbench.utils.exceptions import YooKassaError, NotFound
 
 Configuration.account_id = YOOKASSA_STORE_ID
 Configuration.secret_key = YOOKASSA_AUTH_KEY
+Configuration.api_url = YOOKASSA_API_URL
 
 logger = logging.getLogger(__name__)
 
+# "reccurring_subscription" - старое написание, оставлено для уже созданных платежей
+RECURRING_PAYMENT_TYPES = ("recurring_subscription", "reccurring_subscription")
+
 def get_subscription_from_webhook(response_object):
     metadata = response_object.metadata
     subscription_internal_id_str = metadata.get('subscription_internal_id')
@@ -42,7 +51,7 @@ def get_subscription(subscription_id):
 
 
 def is_user_subscribed(user):
-    return Subscription.objects.filter(user=user, end_date__gt=timezone.now()).exists()
+    return is_entitled(get_entitlement(user))
 
 
 def get_user_subscription(user):
@@ -52,8 +61,7 @@ def get_user_subscription(user):
         raise NotFound("Subscription does not exist")
 
 
-def activate_subscription(token):
-    user = get_user(token)
+def activate_subscription(user):
     try:
         subscription = get_user_subscription(user)
         return recreate_subscription_payment(user, subscription)
@@ -63,6 +71,7 @@ def activate_subscription(token):
 def create_subscription_payment(user):
 
     subscription = Subscription.objects.create(user=user, is_active=False, start_date=timezone.now())
+    subscription.invalidate_entitlement()
     payment_description = f"Оформление ежемесячной подписки для {user.email}"
 
     try:
@@ -70,6 +79,7 @@ def create_subscription_payment(user):
         return payment, subscription
     except Exception as e:
         subscription.delete()
+        subscription.invalidate_entitlement()
         raise YooKassaError(e.args[0])
 
 def recreate_subscription_payment(user, subscription):
@@ -83,14 +93,33 @@ def recreate_subscription_payment(user, subscription):
         # subscription.activate(subscription.latest_yookassa_payment_id)
         subscription.is_active = True
         subscription.save()
+        subscription.invalidate_entitlement()
         return None, subscription
 
-def cancel_subscription(token):
-    user = get_user(token)
+def cancel_subscription(user):
     subscription = get_user_subscription(user)
     subscription.deactivate()
 
 
+def enqueue_webhook(data) -> bool:
+    """
+    Сохраняет уведомление ЮKassa в очередь входящих (WebhookEvent) одним INSERT ... ON CONFLICT DO NOTHING.
+    Возвращает False, если такое событие по этому платежу уже было получено.
+    """
+    payment = data.get('object') if isinstance(data, dict) else None
+    payment_id = payment.get('id') if isinstance(payment, dict) else None
+    event = data.get('event') if isinstance(data, dict) else None
+    if not payment_id or not event:
+        raise ValidationError("Webhook notification has no event or object id")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO "{WebhookEvent._meta.db_table}" (payment_id, event, payload, received_at, attempts) '
+            f'VALUES (%s, %s, %s, %s, 0) ON CONFLICT (payment_id, event) DO NOTHING',
+            [payment_id, event, json.dumps(data), timezone.now()]
+        )
+        return cursor.rowcount == 1
+
+
 def handle_message_from_yookassa(data):
     logger.info("Got message from yookassa")
     try:
@@ -115,7 +144,7 @@ def handle_success(response_object):
     if metadata.get('payment_type') == "initial_subscription":
         subscription.activate(response_object.id, payment.payment_method.id)
         logger.info(f"Initial subscription {subscription.subscription_id} activated")
-    elif metadata.get('payment_type') == "reccurring_subscription":
+    elif metadata.get('payment_type') in RECURRING_PAYMENT_TYPES:
         subscription.renew_subscription(response_object.id)
         logger.info(f"Initial subscription {subscription.subscription_id} updated")
     else:
@@ -127,7 +156,7 @@ def handle_cancel(response_object):
     if metadata.get('payment_type') == "initial_subscription":
         subscription.deactivate()
         logger.info(f"Initial subscription {subscription.subscription_id} deleted, initial payment canceled")
-    elif metadata.get('payment_type') == "reccurring_subscription":
+    elif metadata.get('payment_type') in RECURRING_PAYMENT_TYPES:
         subscription.deactivate()
         logger.info(f"Initial subscription {subscription.subscription_id} deactivated, recurring payment canceled")
     else:
@@ -152,7 +181,7 @@ def create_payment(subscription, description):
         }
     }, uuid.uuid4())
 
-def create_payment_without_confirmation(subscription, description, payment_method_id):
+def create_payment_without_confirmation(subscription, description, payment_method_id, idempotency_key=None):
     return Payment.create({
         "amount": {
             "value": SUBSCRIPTION_PRICE,
@@ -166,4 +195,4 @@ def create_payment_without_confirmation(subscription, description, payment_metho
             "subscription_internal_id": str(subscription.subscription_id),
             "payment_type": "recurring_subscription"
         }
-    })
\ No newline at end of file
+    }, idempotency_key)
@@ -1,36 +1,193 @@
 import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from django.db import DatabaseError, connection, transaction
 from django.utils import timezone
 from yookassa import Configuration
 
-from backend.settings import YOOKASSA_STORE_ID, YOOKASSA_AUTH_KEY
-from subscription.service import create_payment_without_confirmation
-from taskbench.models.models import Subscription
+from backend.settings import YOOKASSA_STORE_ID, YOOKASSA_AUTH_KEY, YOOKASSA_API_URL
+from backend.settings import RECURRING_CHARGE_WORKERS, RECURRING_CHARGE_BATCH_SIZE
+from backend.settings import WEBHOOK_BATCH_SIZE, WEBHOOK_MAX_ATTEMPTS, WEBHOOK_RETENTION_DAYS
+from backend.settings import SUBSCRIPTION_EXPIRY_GRACE
+from subscription.cache import invalidate_entitlements
+from subscription.service import create_payment_without_confirmation, handle_message_from_yookassa
+from taskbench.models.models import Subscription, RecurringChargeRun, WebhookEvent
 
 logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger('subscription.audit')
+
+# Пространство имен для ключей идемпотентности автосписаний (uuid5)
+RENEWAL_NAMESPACE = uuid.UUID('6f1c2a52-8a4e-4d0c-9a53-6d2f0c1e7b41')
+
+
+def renewal_idempotency_key(subscription) -> str:
+    """
+    Ключ идемпотентности списания за период подписки: один и тот же для повторных попыток
+    (перезапуск после падения, ручной запуск), поэтому ЮKassa не спишет деньги дважды.
+    """
+    return str(uuid.uuid5(RENEWAL_NAMESPACE, f"{subscription.subscription_id}:{subscription.end_date.isoformat()}"))
+
+
+def _charge(sub) -> bool:
+    """Создает платеж для одной подписки. Выполняется в потоке пула: только HTTP-запрос, без обращений к базе."""
+    logger.info(f"Attempting to renew subscription {sub.subscription_id} for user {sub.user.email}")
+    try:
+        create_payment_without_confirmation(
+            sub,
+            f"Продление ежемесячной подписки для {sub.user.email}",
+            sub.yookassa_payment_method_id,
+            idempotency_key=renewal_idempotency_key(sub)
+        )
+        logger.info(f"Renewal payment initiated for subscription {sub.subscription_id}.")
+        return True
+    except Exception as e:
+        logger.info(f"Failed to initiate renewal payment for subscription {sub.subscription_id}: {e}")
+        return False
+
+
+def _current_run():
+    """Незавершенный запуск за сегодня (после падения) или новый."""
+    today = timezone.localdate()
+    run = RecurringChargeRun.objects.filter(run_date=today, finished_at__isnull=True).order_by('-run_id').first()
+    if run is not None:
+        logger.info(f"Resuming recurring charge run {run.run_id} after subscription {run.last_subscription_id}")
+        return run
+    return RecurringChargeRun.objects.create(run_date=today)
+
+
+def _claim_run(run):
+    """
+    Блокирует строку запуска до конца текущей транзакции (FOR UPDATE NOWAIT).
+    Возвращает None, если запуск обрабатывает другой процесс: строка заблокирована, запуск уже завершен
+    или сохраненная позиция ушла дальше той, что видел этот процесс.
+    """
+    try:
+        with transaction.atomic():
+            locked = RecurringChargeRun.objects.select_for_update(nowait=True).get(pk=run.pk)
+    except DatabaseError:
+        return None
+    if locked.finished_at is not None or locked.last_subscription_id != run.last_subscription_id:
+        return None
+    return locked
+
 
 def charge_recurring_subscriptions():
+    """
+    Ежедневное автосписание. Подписки обрабатываются пачками по RECURRING_CHARGE_BATCH_SIZE в порядке subscription_id,
+    платежи внутри пачки создаются параллельно в RECURRING_CHARGE_WORKERS потоках.
+    Каждая пачка обрабатывается в своей транзакции, которая блокирует строку RecurringChargeRun и фиксирует прогресс,
+    поэтому если лидер планировщика сменился посреди запуска, прежний лидер останавливается на следующей пачке,
+    а не списывает параллельно с новым.
+    """
     Configuration.account_id = YOOKASSA_STORE_ID
     Configuration.secret_key = YOOKASSA_AUTH_KEY
+    Configuration.api_url = YOOKASSA_API_URL
 
+    run = _current_run()
+    # Продлеваются и подписки, которые закончатся позже сегодня: следующий запуск будет только завтра
+    end_of_today = timezone.make_aware(datetime.combine(run.run_date + timedelta(days=1), time.min))
     subscriptions_to_renew = Subscription.objects.filter(
         is_active=True,
         yookassa_payment_method_id__isnull=False,
-        end_date__lte=timezone.now().date()
-    ).exclude(yookassa_payment_method_id__exact='')
-
-
-    for sub in subscriptions_to_renew:
-        if not sub.yookassa_payment_method_id:
-            logger.info(f"Subscription {sub.subscription_id} has no payment method ID. Skipping renewal.")
-            sub.deactivate()
-            continue
-
-        logger.info(f"Attempting to renew subscription {sub.subscription_id} for user {sub.user.email}")
-        try:
-            create_payment_without_confirmation(sub, f"Продление ежемесячной подписки для {sub.user.email}", sub.yookassa_payment_method_id)
-            logger.info(f"Renewal payment initiated for subscription {sub.subscription_id}.")
-        except Exception as e:
-            logger.info(f"Failed to initiate renewal payment for subscription {sub.subscription_id}: {e}")
-            sub.deactivate()
\ No newline at end of file
+        end_date__lt=end_of_today
+    ).exclude(yookassa_payment_method_id__exact='').select_related('user').order_by('subscription_id')
+
+    with ThreadPoolExecutor(max_workers=RECURRING_CHARGE_WORKERS, thread_name_prefix="recurring-charge") as pool:
+        while True:
+            with transaction.atomic():
+                locked = _claim_run(run)
+                if locked is None:
+                    logger.warning(f"Recurring charge run {run.run_id} is processed by another scheduler, stopping")
+                    return
+                run = locked
+
+                batch = list(subscriptions_to_renew.filter(
+                    subscription_id__gt=run.last_subscription_id
+                )[:RECURRING_CHARGE_BATCH_SIZE])
+                if not batch:
+                    run.finished_at = timezone.now()
+                    run.save(update_fields=['finished_at'])
+                    break
+
+                results = list(pool.map(_charge, batch))
+                for sub, charged in zip(batch, results):
+                    if not charged:
+                        sub.deactivate()
+
+                run.last_subscription_id = batch[-1].subscription_id
+                run.charged += sum(results)
+                run.failed += len(results) - sum(results)
+                run.save(update_fields=['last_subscription_id', 'charged', 'failed'])
+            logger.info(f"Recurring charge run {run.run_id}: {run.charged} charged, {run.failed} failed, "
+                        f"last subscription {run.last_subscription_id}")
+
+    logger.info(f"Recurring charge run {run.run_id} finished: {run.charged} charged, {run.failed} failed")
+
+
+def process_webhook_events() -> int:
+    """
+    Обрабатывает очередь входящих уведомлений ЮKassa, не больше WEBHOOK_BATCH_SIZE событий за запуск.
+    Каждое событие - в своей короткой транзакции: строка блокируется FOR UPDATE SKIP LOCKED (параллельные
+    обработчики не берут одно событие дважды), обрабатывается, помечается и сразу фиксируется,
+    поэтому медленный запрос к ЮKassa (не дольше YOOKASSA_HTTP_TIMEOUT) не задерживает остальные события.
+    Событие с ошибкой остается в очереди и повторяется при следующих запусках, но не больше WEBHOOK_MAX_ATTEMPTS раз.
+    Возвращает количество успешно обработанных событий.
+    """
+    processed = 0
+    last_id = 0
+    for _ in range(WEBHOOK_BATCH_SIZE):
+        with transaction.atomic():
+            event = WebhookEvent.objects.select_for_update(skip_locked=True).filter(
+                processed_at__isnull=True, attempts__lt=WEBHOOK_MAX_ATTEMPTS, webhook_event_id__gt=last_id
+            ).order_by('webhook_event_id').first()
+            if event is None:
+                break
+            last_id = event.webhook_event_id
+
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    handle_message_from_yookassa(data=event.payload)
+                event.processed_at = timezone.now()
+                event.last_error = None
+                processed += 1
+            except Exception as e:
+                event.last_error = str(e)
+                logger.error(f"Webhook event {event.webhook_event_id} ({event.event} for payment "
+                             f"{event.payment_id}) failed, attempt {event.attempts}: {e}")
+            event.save(update_fields=['attempts', 'processed_at', 'last_error'])
+    return processed
+
+
+def purge_webhook_events() -> int:
+    """Удаляет обработанные уведомления старше WEBHOOK_RETENTION_DAYS (до этого они защищают от повторной доставки)."""
+    threshold = timezone.now() - timedelta(days=WEBHOOK_RETENTION_DAYS)
+    deleted, _ = WebhookEvent.objects.filter(processed_at__lt=threshold).delete()
+    logger.info(f"Purged {deleted} processed webhook events")
+    return deleted
+
+
+def expire_subscriptions() -> list:
+    """
+    Деактивирует все активные подписки, закончившиеся больше SUBSCRIPTION_EXPIRY_GRACE секунд назад,
+    одним UPDATE ... RETURNING по индексу subscription_active_end_idx.
+    Отсрочка нужна, чтобы автосписание в 03:00 и уведомление ЮKassa о нем успели продлить подписку.
+    Возвращает список (subscription_id, user_id, end_date) деактивированных подписок.
+    """
+    threshold = timezone.now() - timedelta(seconds=SUBSCRIPTION_EXPIRY_GRACE)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{Subscription._meta.db_table}" SET is_active = false '
+            f'WHERE is_active AND end_date < %s '
+            f'RETURNING subscription_id, user_id, end_date',
+            [threshold]
+        )
+        expired = cursor.fetchall()
+        invalidate_entitlements({user_id for _, user_id, _ in expired})
+
+    for subscription_id, user_id, end_date in expired:
+        audit_logger.info(f"Subscription {subscription_id} of user {user_id} expired at {end_date.isoformat()}, deactivated")
+    logger.info(f"Expired {len(expired)} subscriptions ended before {threshold.isoformat()}")
+    return expired
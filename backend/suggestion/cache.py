@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from backend import settings
+from taskbench.models.models import SuggestionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str, keep_punctuation: bool = False) -> str:
+    """
+    Текст задачи без регистра, знаков препинания и лишних пробелов: 'Помыть  машину!' -> 'помыть машину'.
+    Для сроков знаки сохраняются: в '15:00' или '01.05' они значимы.
+    """
+    if not keep_punctuation:
+        text = re.sub(r'[^\w\s]', ' ', text)
+    return ' '.join(text.casefold().split())
+
+
+def prompt_version(prompt: str) -> str:
+    """Версия промпта - хэш его текста, поэтому после изменения промпта старые ответы не используются."""
+    return hashlib.sha1(prompt.encode()).hexdigest()[:12]
+
+
+def make_key(kind: str, version: str, *parts) -> str:
+    return hashlib.sha256(json.dumps([kind, version, *parts], ensure_ascii=False).encode()).hexdigest()
+
+
+class SuggestionCache:
+    """
+    Двухуровневый кэш ответов GigaChat: LRU в памяти процесса и общая таблица SuggestionCacheEntry.
+    - max_size: записей в памяти, при переполнении вытесняются давно не использованные;
+    - ttl: сколько секунд запись живет в памяти (не дольше, чем в таблице);
+    - db_ttl: срок жизни записи в таблице по умолчанию, просроченные строки удаляет purge_suggestion_cache.
+    Для каждой записи хранится время запроса к GigaChat, поэтому stats() показывает сэкономленное время.
+    """
+
+    def __init__(self, max_size: int, ttl: int, db_ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_ttl = db_ttl
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.llm_seconds = 0.0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value, latency)
+
+    def get(self, key: str, count_miss: bool = True):
+        """
+        Возвращает (найдено, значение). Значение может быть None - это тоже закэшированный ответ.
+        count_miss=False - промах не учитывается в статистике (если дальше проверяется другой ключ).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                self.saved_seconds += entry[2]
+                return True, entry[1]
+            self._entries.pop(key, None)
+
+        try:
+            row = (SuggestionCacheEntry.objects
+                   .filter(key=key, expires_at__gt=timezone.now())
+                   .values_list('value', 'latency', 'expires_at')
+                   .first())
+        except DatabaseError as e:
+            logger.warning(f"Suggestion cache read failed: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += count_miss
+                return False, None
+            value, latency, expires_at = row
+            self.db_hits += 1
+            self.saved_seconds += latency
+            self._remember(key, value, latency, expires_at.timestamp())
+            return True, value
+
+    def put(self, key: str, kind: str, value, latency: float, ttl: int | None = None):
+        expires_at = timezone.now() + timedelta(seconds=ttl or self.db_ttl)
+        with self._lock:
+            self.llm_seconds += latency
+            self._remember(key, value, latency, expires_at.timestamp())
+        try:
+            SuggestionCacheEntry.objects.bulk_create(
+                [SuggestionCacheEntry(key=key, kind=kind, value=value, latency=latency, expires_at=expires_at)],
+                update_conflicts=True, unique_fields=['key'],
+                update_fields=['value', 'latency', 'created_at', 'expires_at']
+            )
+        except DatabaseError as e:
+            logger.warning(f"Suggestion cache write failed: {e}")
+
+    def cached(self, kind: str, version: str, parts: list, compute, ttl: int | None = None):
+        """Ответ из кэша или compute() с сохранением результата. Результат должен сериализоваться в JSON."""
+        key = make_key(kind, version, *parts)
+        found, value = self.get(key)
+        if found:
+            return value
+        started = time.perf_counter()
+        value = compute()
+        self.put(key, kind, value, time.perf_counter() - started, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            requests = hits + self.misses
+            return {
+                'size': len(self._entries),
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / requests, 3) if requests else None,
+                'saved_seconds': round(self.saved_seconds, 3),
+                'llm_seconds': round(self.llm_seconds, 3),
+            }
+
+    def _remember(self, key, value, latency, expires_at):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (min(expires_at, time.time() + self.ttl), value, latency)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+suggestion_cache = SuggestionCache(
+    max_size=settings.SUGGESTION_CACHE_SIZE,
+    ttl=settings.SUGGESTION_CACHE_TTL,
+    db_ttl=settings.SUGGESTION_CACHE_DB_TTL,
+)
+
+
+def purge_suggestion_cache() -> int:
+    """Удаляет просроченные записи из таблицы кэша."""
+    deleted, _ = SuggestionCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+    logger.info(f"Purged {deleted} expired suggestion cache entries")
+    return deleted
@@ -0,0 +1,54 @@
+import threading
+from collections import defaultdict
+
+
+class SuggestionMode:
+    """Режим подсказок (SUGGESTION_MODE)."""
+    SEPARATE = 'separate'  # три отдельных запроса: срок, категория, подзадачи
+    COMBINED = 'combined'  # один запрос с ответом в JSON
+    AB = 'ab'  # половина пользователей (по четности user_id) в combined, остальные в separate
+
+    CHOICES = (SEPARATE, COMBINED, AB)
+
+
+class SuggestionMetrics:
+    """
+    Счетчики подсказок по режимам в памяти процесса, для сравнения режимов (A/B):
+    время ответа эндпоинта, количество запросов к GigaChat и потраченные токены.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: defaultdict(float))
+
+    def record_request(self, mode: str, seconds: float):
+        with self._lock:
+            counters = self._counters[mode]
+            counters['requests'] += 1
+            counters['seconds'] += seconds
+
+    def record_llm_call(self, mode: str, usage):
+        with self._lock:
+            counters = self._counters[mode]
+            counters['llm_calls'] += 1
+            if usage is not None:
+                counters['prompt_tokens'] += usage.prompt_tokens
+                counters['completion_tokens'] += usage.completion_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for mode, counters in self._counters.items():
+                requests = counters['requests'] or 1
+                result[mode] = {
+                    'requests': int(counters['requests']),
+                    'llm_calls': int(counters['llm_calls']),
+                    'avg_seconds': round(counters['seconds'] / requests, 3),
+                    'avg_tokens': round((counters['prompt_tokens'] + counters['completion_tokens']) / requests, 1),
+                    'prompt_tokens': int(counters['prompt_tokens']),
+                    'completion_tokens': int(counters['completion_tokens']),
+                }
+            return result
+
+
+suggestion_metrics = SuggestionMetrics()
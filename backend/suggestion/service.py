@@ -2,22 +2,31 @@ from __future__ import annotations
 
 import logging
 import os
+import queue
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Union
 
 import dateparser.search
+import pydantic
+from django.db import connections
 from gigachat import GigaChat
 from gigachat.models import Chat, Messages, MessagesRole
-from pydantic import ValidationError
+from rest_framework.exceptions import ValidationError
 
+from backend import settings
 from subscription.service import is_user_subscribed
+from suggestion.cache import suggestion_cache, normalize_text, prompt_version, make_key
+from suggestion.metrics import SuggestionMode, suggestion_metrics
 from taskbench.models.models import Category
 from taskbench.serializers.task_serializers import TaskDPCtoFlatSerializer
-from taskbench.services.user_service import get_user
 from taskbench.utils.decorators import singleton
 
 GIGACHAT_API_SAFETY_GAP = 60
+GIGACHAT_TOKEN_RETRY_DELAY = 5
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +59,42 @@ CATEGORY_SYSTEM_PROMPT = """
 """
 
 
+COMBINED_SYSTEM_PROMPT = """
+Проанализируй введенную пользователем задачу и ответь ТОЛЬКО JSON-объектом без пояснений и разметки:
+{"deadline": "...", "category": 0, "subtasks": ["...", "..."]}
+deadline - предположительные дата и время срока задачи в формате YYYY:MM:DD hh:mm.
+Если время указано относительно, например словами 'завтра' или 'в следующую среду', в качестве точки отсчета используй текущее время.
+В приоритете всегда предполагай время из будущего.
+Если известно только время, считай датой сегодня. Если известна только дата, считай время таким же как сейчас.
+Если и время и дата не указаны, deadline - "-".
+category - номер подходящей категории из списка ниже, -1 если ни одна не подходит или список пуст.
+subtasks - несколько мелких подзадач, каждая не более чем из четырех слов, без нумерации.
+"""
+
+
+class CombinedSuggestion(pydantic.BaseModel):
+    """Ответ GigaChat в режиме combined. Поле с неверным типом становится None и заменяется обычным разбором."""
+    deadline: str | None = None
+    category: int | str | None = None
+    subtasks: list[str] | str | None = None
+
+    @pydantic.field_validator('*', mode='wrap')
+    @classmethod
+    def _drop_invalid(cls, value, handler):
+        try:
+            return handler(value)
+        except pydantic.ValidationError:
+            return None
+
+    @pydantic.field_validator('category')
+    @classmethod
+    def _category_index(cls, value):
+        # "1" - такой же номер категории, как 1, а не ее название
+        if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+            return int(value)
+        return value
+
+
 def get_subtask_prompt():
     return SUBTASK_SYSTEM_PROMPT_V2
 
@@ -62,18 +107,37 @@ def get_category_system_prompt(category_names: list):
     return CATEGORY_SYSTEM_PROMPT + ', '.join(category_names)
 
 
-def suggest(token, data):
+def get_combined_system_prompt(user_datetime, category_names: list):
+    categories = '\n'.join(f"{i}. {name}" for i, name in enumerate(category_names))
+    return (COMBINED_SYSTEM_PROMPT + "\nТекущее время (точка отсчета): " + user_datetime.isoformat(timespec='minutes')
+            + "\nСписок категорий:\n" + categories)
+
+
+if settings.SUGGESTION_MODE not in SuggestionMode.CHOICES:
+    logger.warning(f"Unknown SUGGESTION_MODE '{settings.SUGGESTION_MODE}', expected one of {SuggestionMode.CHOICES}; "
+                   f"falling back to '{SuggestionMode.SEPARATE}'")
+
+
+def get_suggestion_mode(user) -> str:
+    mode = settings.SUGGESTION_MODE
+    if mode not in SuggestionMode.CHOICES:
+        return SuggestionMode.SEPARATE
+    if mode == SuggestionMode.AB:
+        return SuggestionMode.COMBINED if user.user_id % 2 else SuggestionMode.SEPARATE
+    return mode
+
+
+def suggest(user, data):
     """
 
-    :param token:
+    :param user:
     :param data:
     :return: subtasks, category names (list), category_id, deadline
     """
 
-    user = get_user(token)
     serializer = TaskDPCtoFlatSerializer(data=data)
     if not serializer.is_valid():
-        return ValidationError(serializer.errors)
+        raise ValidationError(serializer.errors)
     input_data = serializer.validated_data
     deadline = input_data.get('deadline')
     title = input_data.get('title')
@@ -85,22 +149,49 @@ def suggest(token, data):
     subscribed = is_user_subscribed(user)
     # subscribed = True
 
-    if deadline is None:
-        if not subscribed:
-            deadline = service.suggest_deadline_local(title, now=timestamp)
-        else:
-            deadline = service.suggest_deadline(title, now=timestamp)
-
     """
         Проверка пользователя на подписку.
     """
     if not subscribed:
+        if deadline is None:
+            deadline = service.suggest_deadline_local(title, now=timestamp)
         return None, None, None, deadline
 
+    categories = []
+    if category_id is None:
+        categories = list(Category.objects.filter(user=user))
+    category_names = [c.name for c in categories]
+
+    mode = get_suggestion_mode(user)
+    started = time.perf_counter()
+    if mode == SuggestionMode.COMBINED:
+        # Один запрос вместо трех, каждое поле ответа при ошибке разбирается отдельно
+        results = run_components({
+            'combined': (
+                lambda: service.suggest_combined(title, category_names, now=timestamp),
+                lambda: {'deadline': service.suggest_deadline_local(title, now=timestamp), 'category': -1, 'subtasks': []},
+            ),
+        })['combined']
+    else:
+        # Запросы к GigaChat независимы, поэтому выполняются параллельно: время ответа - самый долгий из них, а не сумма
+        components = {
+            'subtasks': (lambda: service.suggest_subtasks(title), lambda: []),
+        }
+        if deadline is None:
+            components['deadline'] = (
+                lambda: service.suggest_deadline(title, now=timestamp),
+                lambda: service.suggest_deadline_local(title, now=timestamp),
+            )
+        if category_id is None:
+            components['category'] = (lambda: service.suggest_category(title, category_names), lambda: -1)
+        results = run_components(components)
+    suggestion_metrics.record_request(mode, time.perf_counter() - started)
+
+    if deadline is None:
+        deadline = results['deadline']
+
     if category_id is None:
-        categories = Category.objects.filter(user=user)
-        category_names = [c.name for c in categories]
-        category_index = service.suggest_category(title, category_names)
+        category_index = results['category']
         category_name = ''
         if category_index < 0 or category_index >= len(categories):
             category_id = None
@@ -110,45 +201,152 @@ def suggest(token, data):
     else:
         category_name = Category.objects.get(category_id=category_id).name
 
-    subtasks = service.suggest_subtasks(title)
+    subtasks = results['subtasks']
 
     return subtasks, category_name, category_id, deadline
 
 
+_executor = ThreadPoolExecutor(max_workers=settings.SUGGESTION_WORKERS, thread_name_prefix="suggestion")
+
+
+def _run_in_pool(func):
+    try:
+        return func()
+    finally:
+        # Потоки пула живут дольше запроса, поэтому соединение с базой (кэш подсказок) не оставляем открытым
+        connections.close_all()
+
+
+def run_components(components: dict) -> dict:
+    """
+    Выполняет компоненты подсказки параллельно в общем пуле потоков.
+    components: имя -> (функция, запасная функция). Каждому компоненту дается SUGGESTION_COMPONENT_TIMEOUT секунд
+    с момента, когда он начал выполняться (под нагрузкой он может сначала постоять в очереди пула),
+    но все вместе ждут не дольше SUGGESTION_TIMEOUT. Если компонент не успел или упал,
+    результат берется из запасной функции (локальный разбор даты, пустой список и т.п.).
+    Компоненты, которые к этому моменту так и не начались, отменяются и не занимают пул запросами к GigaChat.
+    """
+    started = time.monotonic()
+    deadline = started + settings.SUGGESTION_TIMEOUT
+    events = queue.SimpleQueue()  # (имя, время начала) при запуске компонента, (имя, None) по завершении
+
+    def run(name, func):
+        events.put((name, time.monotonic()))
+        return _run_in_pool(func)
+
+    futures = {}
+    for name, (func, _) in components.items():
+        futures[name] = _executor.submit(run, name, func)
+        futures[name].add_done_callback(lambda _, name=name: events.put((name, None)))
+
+    running_since = {}
+    pending = set(futures)
+    timed_out = set()
+    while pending:
+        component_deadlines = [running_since[name] + settings.SUGGESTION_COMPONENT_TIMEOUT
+                               for name in pending if name in running_since]
+        try:
+            name, since = events.get(timeout=max(0.0, min([deadline, *component_deadlines]) - time.monotonic()))
+            if since is None:
+                pending.discard(name)
+            else:
+                running_since[name] = since
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        if now >= deadline:
+            timed_out |= pending
+            break
+        timed_out |= {name for name in pending
+                      if name in running_since and now >= running_since[name] + settings.SUGGESTION_COMPONENT_TIMEOUT}
+        pending -= timed_out
+
+    results = {}
+    for name, future in futures.items():
+        if name in timed_out:
+            queued = future.cancel()
+            logger.warning(f"Suggestion component '{name}' timed out after {time.monotonic() - started:.2f} s"
+                           + (" in the pool queue" if queued else ""))
+            results[name] = components[name][1]()
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.error(f"Suggestion component '{name}' failed: {e}")
+            results[name] = components[name][1]()
+    return results
+
+
 @singleton
 class SuggestionService:
 
     def __init__(self, debug: bool = False):
         self.giga = GigaChat(
             credentials=os.getenv('GIGACHAT_AUTH_KEY'),
-            verify_ssl_certs=False
+            verify_ssl_certs=False,
+            # Ответ, который не дождется suggest(), не должен надолго занимать поток пула
+            timeout=settings.SUGGESTION_COMPONENT_TIMEOUT
         )
 
         self.debug = debug
         if self.debug:
             return
 
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher_pid = None
+        self._refresh_token()
+        self._ensure_refresher()
+
+    def update_token(self):
+        """
+        Вызывается перед запросом к GigaChat и никогда не блокируется: токен получает только фоновый поток,
+        за GIGACHAT_API_SAFETY_GAP секунд до истечения. Если срок уже подошел (поток не успел или получение
+        токена не удалось), поток будится, а запрос идет с текущим токеном - при 401 клиент GigaChat обновит его сам.
+        """
+        self._ensure_refresher()
+        if self._seconds_until_refresh() <= 0:
+            self._wake.set()
+
+    def _refresh_token(self):
         response = self.giga.get_token()
 
         if response is None:
             raise RuntimeError("Не удалось получить токен от GigaChat")
 
-        self.access_token = response.access_token
-        self.expires_at = datetime.fromtimestamp(response.expires_at / 1000, tz=timezone.utc)
-
-    def update_token(self):
-        if self.expires_at < datetime.now(timezone.utc):
-            response = self.giga.get_token()
-
-            if response is None:
-                raise RuntimeError("Не удалось получить токен от GigaChat")
-
-            logger.info('updating GIGACHAT token')
+        logger.info('updating GIGACHAT token')
 
+        with self._lock:
             self.access_token = response.access_token
             self.expires_at = datetime.fromtimestamp(response.expires_at / 1000, tz=timezone.utc)
 
-    def send_message_with_system_prompt(self, system_prompt: str, user_text: str):
+    def _seconds_until_refresh(self) -> float:
+        with self._lock:
+            expires_at = self.expires_at
+        return (expires_at - datetime.now(timezone.utc)).total_seconds() - GIGACHAT_API_SAFETY_GAP
+
+    def _ensure_refresher(self):
+        # После fork (gunicorn --preload) поток родителя не существует, поэтому запускается заново в каждом процессе
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        threading.Thread(target=self._refresh_forever, name="gigachat-token-refresher", daemon=True).start()
+
+    def _refresh_forever(self):
+        while True:
+            delay = self._seconds_until_refresh()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            try:
+                self._refresh_token()
+            except Exception as e:
+                logger.error(f"Failed to refresh GigaChat token: {e}")
+                time.sleep(GIGACHAT_TOKEN_RETRY_DELAY)
+
+    def send_message_with_system_prompt(self, system_prompt: str, user_text: str, mode: str = SuggestionMode.SEPARATE):
         if self.debug: return None
 
         self.update_token()
@@ -166,6 +364,7 @@ class SuggestionService:
                 ]
             )
         )
+        suggestion_metrics.record_llm_call(mode, result.usage)
         return result
 
     def suggest_subtasks(self, text: str) -> list:
@@ -175,12 +374,21 @@ class SuggestionService:
         """
         if self.debug:
             return ["1. Начать делать задачу", "2. Продолжить делать задачу", "3. Закончить делать задачу"]
-        self.update_token()
 
+        return suggestion_cache.cached(
+            'subtasks', prompt_version(get_subtask_prompt()), [normalize_text(text)],
+            lambda: self._ask_subtasks(text)
+        )
+
+    def _ask_subtasks(self, text: str) -> list:
         result = self.send_message_with_system_prompt(get_subtask_prompt(), text)
+        return self._parse_subtasks(result.choices[0].message.content)
+
+    @staticmethod
+    def _parse_subtasks(content: str) -> list:
         subtasks = [
             match.group(1).strip().lower()
-            for line in result.choices[0].message.content.split('\n')
+            for line in content.split('\n')
             if (match := re.match(r'^(?:\d+\.\s*|-\s*)?([^.]+)\.?$', line.strip()))]
 
         return subtasks
@@ -198,13 +406,20 @@ class SuggestionService:
 
         if self.debug:
             return 0
-        self.update_token()
-        result = self.send_message_with_system_prompt(
-            get_category_system_prompt(category_names),
-            text).choices[0].message.content
+        # Ответ - название категории, поэтому кэш не зависит от порядка категорий пользователя
+        result = suggestion_cache.cached(
+            'category', prompt_version(CATEGORY_SYSTEM_PROMPT),
+            [normalize_text(text), sorted({normalize_text(name) for name in category_names})],
+            lambda: self.send_message_with_system_prompt(
+                get_category_system_prompt(category_names),
+                text).choices[0].message.content
+        )
+
+        return self._match_category(result, category_names)
 
+    def _match_category(self, answer: str, category_names: list) -> int:
         for i in range(len(category_names)):
-            if self._equal_ignore_space_case(category_names[i], result):
+            if self._equal_ignore_space_case(category_names[i], answer):
                 return i
 
         return -1
@@ -237,11 +452,9 @@ class SuggestionService:
 
         now = now or datetime.now().replace(tzinfo=None)
 
-        result = self.send_message_with_system_prompt(
-            get_time_system_prompt(now),
-            text).choices[0].message.content
+        return self._parse_deadline(self._ask_deadline(text, now), text, now)
 
-        cleaned_text = result.strip()
+    def _parse_deadline(self, cleaned_text: str, text: str, now: datetime) -> datetime | None:
         if cleaned_text == "-":
             return self.suggest_deadline_local(text, now=now)
 
@@ -257,6 +470,87 @@ class SuggestionService:
             local_suggest = self.suggest_deadline_local(text, now=now)
             return local_suggest
 
+    def _ask_deadline(self, text: str, now: datetime) -> str:
+        """
+        Ответ GigaChat о сроке задачи, через кэш.
+        Ответ "-" (срока в тексте нет) не зависит от текущего времени и кэшируется только по тексту,
+        остальные - по тексту и текущему времени с точностью до минуты, как оно передается в промпте,
+        поэтому относительные сроки ('завтра', 'через час') не переносятся на другое время.
+        """
+        version = prompt_version(TIME_SYSTEM_PROMPT)
+        normalized = normalize_text(text, keep_punctuation=True)
+        timeless_key = make_key('deadline', version, normalized)
+        found, answer = suggestion_cache.get(timeless_key, count_miss=False)
+        if found:
+            return answer
+        timed_key = make_key('deadline', version, normalized, now.isoformat(timespec='minutes'))
+        found, answer = suggestion_cache.get(timed_key)
+        if found:
+            return answer
+
+        started = time.perf_counter()
+        answer = self.send_message_with_system_prompt(
+            get_time_system_prompt(now),
+            text).choices[0].message.content.strip()
+        latency = time.perf_counter() - started
+        if answer == "-":
+            suggestion_cache.put(timeless_key, 'deadline', answer, latency)
+        else:
+            suggestion_cache.put(timed_key, 'deadline', answer, latency, ttl=settings.SUGGESTION_DEADLINE_CACHE_TTL)
+        return answer
+
+    def suggest_combined(self, text: str, category_names: list, *, now: datetime | None = None) -> dict:
+        """
+        Срок, категория и подзадачи одним запросом к GigaChat (режим combined).
+        Ответ проверяется CombinedSuggestion; поле, которое не удалось разобрать,
+        берется из обычных разборщиков: локальный поиск даты, категория по названию, подзадачи по строкам.
+        :return: {'deadline': datetime | None, 'category': индекс или -1, 'subtasks': list}
+        """
+        now = now or datetime.now().replace(tzinfo=None)
+        if self.debug:
+            return {
+                'deadline': self.suggest_deadline_local(text, now=now),
+                'category': 0 if category_names else -1,
+                'subtasks': self.suggest_subtasks(text),
+            }
+
+        # Ответ зависит от текущего времени, поэтому ключ кэша - как у сроков (с точностью до минуты)
+        content = suggestion_cache.cached(
+            'combined', prompt_version(COMBINED_SYSTEM_PROMPT),
+            [normalize_text(text, keep_punctuation=True), category_names, now.isoformat(timespec='minutes')],
+            lambda: self.send_message_with_system_prompt(
+                get_combined_system_prompt(now, category_names), text, mode=SuggestionMode.COMBINED
+            ).choices[0].message.content,
+            ttl=settings.SUGGESTION_DEADLINE_CACHE_TTL
+        )
+
+        match = re.search(r'\{.*\}', content, re.DOTALL)
+        try:
+            answer = CombinedSuggestion.model_validate_json(match.group(0) if match else content)
+        except pydantic.ValidationError as e:
+            logger.warning(f"Combined suggestion is not valid JSON: {e}")
+            answer = CombinedSuggestion()
+
+        if isinstance(answer.category, int):
+            category = answer.category if 0 <= answer.category < len(category_names) else -1
+        elif isinstance(answer.category, str):
+            category = self._match_category(answer.category, category_names)
+        else:
+            category = -1
+
+        if isinstance(answer.subtasks, list):
+            subtasks = self._parse_subtasks('\n'.join(answer.subtasks))
+        elif isinstance(answer.subtasks, str):
+            subtasks = self._parse_subtasks(answer.subtasks)
+        else:
+            subtasks = []
+
+        return {
+            'deadline': self._parse_deadline(answer.deadline.strip() if answer.deadline else "-", text, now),
+            'category': category,
+            'subtasks': subtasks,
+        }
+
     def suggest_deadline_local(self, text: str, *, now: datetime | None = None) -> datetime | None:
         """
         Анализирует текст локально с естественным языком и ищет даты.
@@ -4,16 +4,14 @@ from django.http import JsonResponse
 from rest_framework.views import APIView
 
 from suggestion.service import suggest
-from taskbench.services.user_service import get_token
 
 
 class SuggestionView(APIView):
 
     def post(self, request):
         data = json.loads(request.body)
-        token = get_token(request)
 
-        subtasks, category_name, category_id, deadline = suggest(token, data)
+        subtasks, category_name, category_id, deadline = suggest(request.user, data)
 
         return JsonResponse({
             "suggested_dpc": {
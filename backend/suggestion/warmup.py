@@ -0,0 +1,50 @@
+"""
+Прогрев подсказок при старте gunicorn (см. gunicorn.conf.py), чтобы первый запрос /ai/suggestions/ в воркере
+не ждал загрузку языковых данных dateparser и получение токена GigaChat.
+"""
+
+import logging
+import time
+from datetime import datetime
+
+import dateparser.search
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_TEXT = "Созвон завтра в 15:00, отчет сдать к следующей пятнице"
+
+
+def preload_dateparser() -> float:
+    """
+    Загружает русские таблицы и регулярные выражения dateparser тем же вызовом, что и suggest_deadline_local.
+    С gunicorn --preload вызывается в мастере до fork, и загруженные данные воркеры делят (copy-on-write).
+    Возвращает время в секундах.
+    """
+    started = time.perf_counter()
+    dateparser.search.search_dates(
+        WARM_UP_TEXT,
+        languages=["ru"],
+        settings={
+            "RELATIVE_BASE": datetime.now(),
+            "PREFER_DATES_FROM": "future",
+            "RETURN_AS_TIMEZONE_AWARE": False,
+        },
+    )
+    return time.perf_counter() - started
+
+
+def init_suggestion_service() -> float | None:
+    """
+    Создает SuggestionService: клиент GigaChat, токен и фоновый поток его обновления.
+    Вызывается в каждом воркере после fork: HTTP-соединения и потоки нельзя унаследовать от мастера.
+    Возвращает время в секундах или None, если GigaChat недоступен (тогда сервис создастся при первом запросе).
+    """
+    from suggestion.service import SuggestionService  # импортирует модели, поэтому только после django.setup()
+
+    started = time.perf_counter()
+    try:
+        SuggestionService(debug=False)
+    except Exception as e:
+        logger.warning(f"GigaChat warm-up failed, the client will be created on the first request: {e}")
+        return None
+    return time.perf_counter() - started
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from taskbench.models.models import CompletionStreak, DailyCompletion, Task, User
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает DailyCompletion и CompletionStreak по выполненным задачам. Можно запускать повторно."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="пользователей в одной транзакции")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_user_id = User.objects.aggregate(last=Max('user_id'))['last'] or 0
+        rollup, tasks, streak = DailyCompletion._meta.db_table, Task._meta.db_table, CompletionStreak._meta.db_table
+        rows = 0
+
+        # Пачками по user_id, чтобы не держать одну длинную транзакцию на всю таблицу задач
+        for first in range(1, last_user_id + 1, batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO "{rollup}" AS d (user_id, day, count) '
+                    f'SELECT user_id, (completed_at AT TIME ZONE %s)::date, count(*) FROM "{tasks}" '
+                    f'WHERE is_completed AND completed_at IS NOT NULL AND user_id >= %s AND user_id < %s '
+                    f'GROUP BY 1, 2 '
+                    f'ON CONFLICT (user_id, day) DO UPDATE SET count = EXCLUDED.count',
+                    [timezone.get_current_timezone_name(), first, first + batch_size]
+                )
+                rows += cursor.rowcount
+                # Серии - группы дней подряд: у них day - номер строки одинаковый (gaps and islands)
+                cursor.execute(
+                    f'INSERT INTO "{streak}" AS s (user_id, current, longest, last_day) '
+                    f'SELECT user_id, (array_agg(length ORDER BY island_end DESC))[1], max(length), max(island_end) '
+                    f'FROM ('
+                    f'  SELECT user_id, count(*) AS length, max(day) AS island_end FROM ('
+                    f'    SELECT user_id, day, day - (row_number() OVER (PARTITION BY user_id ORDER BY day))::int AS island '
+                    f'    FROM "{rollup}" WHERE count > 0 AND user_id >= %s AND user_id < %s'
+                    f'  ) AS days GROUP BY user_id, island'
+                    f') AS islands GROUP BY user_id '
+                    f'ON CONFLICT (user_id) DO UPDATE SET '
+                    f'current = EXCLUDED.current, longest = EXCLUDED.longest, last_day = EXCLUDED.last_day',
+                    [first, first + batch_size]
+                )
+            self.stdout.write(f"users {first}..{min(first + batch_size - 1, last_user_id)}: {rows} days total")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {rows} daily completion rows"))
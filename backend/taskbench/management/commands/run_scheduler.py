@@ -0,0 +1,103 @@
+import logging
+import os
+import signal
+import socket
+import threading
+from datetime import timedelta
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from backend import settings
+from taskbench.models.models import SchedulerHeartbeat
+from taskbench.scheduler import create_scheduler
+from taskbench.utils.leader_lock import LeaderLock
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ("Запускает планировщик задач. Можно запускать в нескольких экземплярах: задачи выполняет только лидер "
+            "(advisory lock в PostgreSQL), остальные ждут в резерве и подхватывают работу, если лидер пропал.")
+
+    def handle(self, *args, **options):
+        self.instance = f"{socket.gethostname()}:{os.getpid()}"
+        self.stop = threading.Event()
+        self.counters_lock = threading.Lock()
+        self.counters = {'jobs_executed': 0, 'jobs_failed': 0, 'last_job_id': None, 'last_job_at': None}
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stop.set())
+
+        lock = LeaderLock(settings.SCHEDULER_LOCK_KEY)
+        self.scheduler = None
+        self.leader_since = None
+        SchedulerHeartbeat.objects.update_or_create(instance=self.instance, defaults={'started_at': timezone.now()})
+        logger.info(f"Scheduler {self.instance} started in standby.")
+        try:
+            while not self.stop.is_set():
+                self.elect(lock)
+                self.heartbeat(self.scheduler is not None, self.leader_since)
+                self.stop.wait(settings.SCHEDULER_HEARTBEAT_INTERVAL)
+        finally:
+            self.scheduler = self.step_down(self.scheduler, lock)
+            SchedulerHeartbeat.objects.filter(instance=self.instance).delete()
+            logger.info(f"Scheduler {self.instance} stopped.")
+
+    def elect(self, lock):
+        """Одна итерация выбора лидера: резервный процесс пытается взять блокировку, лидер проверяет, что она жива."""
+        try:
+            if self.scheduler is None:
+                if lock.acquire():
+                    self.leader_since = timezone.now()
+                    self.scheduler = self.start_scheduler()
+                    logger.info(f"Scheduler {self.instance} became the leader.")
+            else:
+                lock.check()
+        except Exception as e:
+            logger.warning(f"Scheduler {self.instance} lost the leader lock: {e}")
+            self.scheduler = self.step_down(self.scheduler, lock)
+            self.leader_since = None
+
+    def start_scheduler(self):
+        scheduler = create_scheduler()
+        scheduler.add_listener(self.on_job_event, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+        scheduler.start()
+        return scheduler
+
+    @staticmethod
+    def step_down(scheduler, lock):
+        if scheduler is not None:
+            # Уже запущенные задачи дорабатывают в своих потоках, новые не запускаются.
+            # Автосписание при этом не идет параллельно с новым лидером: каждая пачка блокирует строку
+            # RecurringChargeRun, и прежний лидер останавливается, как только запуск подхватил другой процесс
+            scheduler.shutdown(wait=False)
+        lock.release()
+        return None
+
+    def on_job_event(self, event):
+        with self.counters_lock:
+            if event.code == EVENT_JOB_EXECUTED:
+                self.counters['jobs_executed'] += 1
+            else:
+                self.counters['jobs_failed'] += 1
+                logger.error(f"Scheduled job '{event.job_id}' failed or was missed: {getattr(event, 'exception', None)}")
+            self.counters['last_job_id'] = event.job_id
+            self.counters['last_job_at'] = timezone.now()
+
+    def heartbeat(self, is_leader, leader_since):
+        with self.counters_lock:
+            counters = dict(self.counters)
+        try:
+            close_old_connections()
+            SchedulerHeartbeat.objects.update_or_create(
+                instance=self.instance,
+                defaults={'is_leader': is_leader, 'leader_since': leader_since, 'heartbeat_at': timezone.now(),
+                          **counters}
+            )
+            if is_leader:
+                # Строки процессов, которые завершились без очистки (kill -9, падение ноды)
+                SchedulerHeartbeat.objects.filter(heartbeat_at__lt=timezone.now() - timedelta(days=1)).delete()
+        except Exception as e:
+            logger.warning(f"Scheduler {self.instance} failed to write heartbeat: {e}")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 20:11
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY не работает внутри транзакции, зато не блокирует запись в таблицу
+    atomic = False
+
+    dependencies = [
+        ('taskbench', '0006_rename_transaction_id_subscription_latest_yookassa_payment_id_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['user', '-priority', 'deadline', 'task_id'], name='task_open_priority_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['user', 'deadline', '-priority', 'task_id'], name='task_open_deadline_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['user', 'completed_at'], include=('task_id',), name='task_completed_at_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 20:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0007_task_list_and_statistics_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDataVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to='taskbench.user')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индексы по updated_at строятся CONCURRENTLY, чтобы не блокировать запись в таблицы
+    atomic = False
+
+    dependencies = [
+        ('taskbench', '0009_sync_updated_at_and_tombstones'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='subtask',
+            index=models.Index(fields=['task', 'updated_at'], name='subtask_task_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='category',
+            index=models.Index(fields=['user', 'updated_at'], name='category_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0010_sync_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCompletion',
+            fields=[
+                ('daily_completion_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_completions', to='taskbench.user')),
+            ],
+            options={
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 20:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0011_dailycompletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionStreak',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='completion_streak', serialize=False, to='taskbench.user')),
+                ('current', models.IntegerField(default=0)),
+                ('longest', models.IntegerField(default=0)),
+                ('last_day', models.DateField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 20:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0012_completionstreak'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('snapshot_id', models.IntegerField(default=1, primary_key=True, serialize=False)),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('estimated', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
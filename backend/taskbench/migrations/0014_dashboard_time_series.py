@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 20:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_activity_days(apps, schema_editor):
+    """До этой миграции известен только последний день обращения каждого пользователя."""
+    User = apps.get_model('taskbench', 'User')
+    UserActivityDay = apps.get_model('taskbench', 'UserActivityDay')
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"""
+            INSERT INTO {quote(UserActivityDay._meta.db_table)} (user_id, day)
+            SELECT {quote(User._meta.pk.column)}, (access_at AT TIME ZONE %s)::date
+            FROM {quote(User._meta.db_table)} WHERE access_at IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """,
+        params=[settings.TIME_ZONE],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0013_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityDay',
+            fields=[
+                ('user_activity_day_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='useractivityday',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_days', to='taskbench.user'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='useractivityday',
+            unique_together={('day', 'user')},
+        ),
+        migrations.RunPython(seed_activity_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индексы на больших таблицах строятся CONCURRENTLY, чтобы не блокировать запись
+    atomic = False
+
+    dependencies = [
+        ('taskbench', '0014_dashboard_time_series'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='dailycompletion',
+            index=models.Index(fields=['day'], name='daily_completion_day_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='subscription',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['start_date'], name='subscription_start_date_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='task_created_at_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='user_created_at_brin'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 20:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0016_subscription_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringChargeRun',
+            fields=[
+                ('run_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('run_date', models.DateField()),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('last_subscription_id', models.IntegerField(default=0)),
+                ('charged', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 20:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0017_recurringchargerun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerHeartbeat',
+            fields=[
+                ('instance', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('is_leader', models.BooleanField(default=False)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('leader_since', models.DateTimeField(null=True)),
+                ('heartbeat_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('jobs_executed', models.IntegerField(default=0)),
+                ('jobs_failed', models.IntegerField(default=0)),
+                ('last_job_id', models.CharField(max_length=255, null=True)),
+                ('last_job_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 20:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0018_schedulerheartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('webhook_event_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('payment_id', models.CharField(max_length=100)),
+                ('event', models.CharField(max_length=64)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['webhook_event_id'], name='webhook_event_pending_idx')],
+                'unique_together': {('payment_id', 'event')},
+            },
+        ),
+    ]
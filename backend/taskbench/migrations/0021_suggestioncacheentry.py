@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 20:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskbench', '0020_subscription_active_end_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=16)),
+                ('value', models.JSONField(null=True)),
+                ('latency', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -1,6 +1,9 @@
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.postgres.indexes import BrinIndex, OpClass
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Now, Upper
 from django.utils import timezone
 
 
@@ -12,9 +15,22 @@ class User(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     access_at = models.DateTimeField(default=timezone.now, null=True)
 
+    class Meta:
+        indexes = [
+            # Временные ряды дашборда. Строки добавляются в порядке created_at, поэтому BRIN в разы меньше B-tree
+            BrinIndex(fields=['created_at'], name='user_created_at_brin'),
+            # Поиск по началу email без учета регистра (email__istartswith) в списке подписок дашборда
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='user_email_prefix_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
+    @property
+    def is_authenticated(self):
+        """Нужно для DRF: пользователь из JwtAuthentication всегда аутентифицирован"""
+        return True
+
     def set_password(self, password):
         """Хэширует пароль"""
         self.password_hash = make_password(password)
@@ -32,9 +48,26 @@ class Task(models.Model):
     is_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())  # db_default - для вставок в обход ORM
     ai_processed = models.BooleanField(default=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=False, blank=False, related_name='tasks') #многие к одному к юзеру
 
+    class Meta:
+        indexes = [
+            # GET /tasks/ - открытые задачи пользователя в порядке sort_by=priority и sort_by=deadline
+            models.Index(fields=['user', '-priority', 'deadline', 'task_id'], condition=Q(is_completed=False),
+                         name='task_open_priority_idx'),
+            models.Index(fields=['user', 'deadline', '-priority', 'task_id'], condition=Q(is_completed=False),
+                         name='task_open_deadline_idx'),
+            # GET /statistics/ - выполненные задачи пользователя по completed_at, покрывающий (index-only scan)
+            models.Index(fields=['user', 'completed_at'], include=['task_id'], condition=Q(is_completed=True),
+                         name='task_completed_at_idx'),
+            # GET /sync/ - измененные задачи пользователя
+            models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+            # Временные ряды дашборда по всем пользователям
+            BrinIndex(fields=['created_at'], name='task_created_at_brin'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -45,11 +78,18 @@ class Subtask(models.Model):
     text = models.TextField(null=False)
     is_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
     task = models.ForeignKey(Task, on_delete=models.CASCADE, null=False, blank=False, related_name='subtasks')
     #null=False — в базе данных поле task_id не может быть NULL, т.е. каждой подзадаче обязательно соответствует задача.
     #blank=False — в формах Django (например, в админке) нельзя оставить это поле пустым. Пользователь обязан выбрать связанную задачу.
     #on_delete=models.CASCADE - Если удалить Task, то все связанные Subtask тоже автоматически удалятся.
 
+    class Meta:
+        indexes = [
+            # GET /sync/ - у подзадачи нет user, поэтому поиск идет по задачам пользователя
+            models.Index(fields=['task', 'updated_at'], name='subtask_task_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Subtask of {self.task.title}"
 
@@ -57,8 +97,14 @@ class Subtask(models.Model):
 class Category(models.Model):
     category_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=50, null=False)
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=False, blank=False, related_name='categories')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='category_user_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -77,6 +123,86 @@ class TaskCategory(models.Model):
     def __str__(self):
         return f"{self.task.title} - {self.category.name}"
 
+class DailyCompletion(models.Model):
+    """
+    Сколько задач пользователь выполнил за день (дата completed_at в текущем часовом поясе).
+    Увеличивается в complete_task, прошлые данные заполняются командой backfill_daily_completions.
+    """
+    daily_completion_id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_completions')
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'day')
+        indexes = [
+            # Временной ряд выполненных задач в дашборде (по всем пользователям)
+            models.Index(fields=['day'], name='daily_completion_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.count}"
+
+class CompletionStreak(models.Model):
+    """
+    Серия дней подряд с выполненными задачами. Обновляется в complete_task вместе с DailyCompletion,
+    поэтому для чтения не нужно просматривать историю. Если last_day раньше вчерашнего дня, серия прервана.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='completion_streak')
+    current = models.IntegerField(default=0)
+    longest = models.IntegerField(default=0)
+    last_day = models.DateField(null=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.current} (longest {self.longest})"
+
+class UserActivityDay(models.Model):
+    """
+    День, в который пользователь обращался к API: из User.access_at видно только последнее обращение.
+    Пишется при первом обращении за день (см. taskbench.services.access_service).
+    """
+    user_activity_day_id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_days')
+    day = models.DateField()
+
+    class Meta:
+        unique_together = ('day', 'user')  # индекс начинается с day - по нему строится временной ряд
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}"
+
+class UserDataVersion(models.Model):
+    """Счетчик изменений задач, подзадач и категорий пользователя. По нему строятся ETag для GET-запросов."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.version}"
+
+class Tombstone(models.Model):
+    """
+    Запись об удалении объекта для GET /sync/: удаленные подзадачи и категории, выполненные задачи
+    (в списке задач их больше нет). Старые записи удаляются по расписанию (SYNC_TOMBSTONE_TTL_DAYS).
+    """
+    TASK = 'task'
+    SUBTASK = 'subtask'
+    CATEGORY = 'category'
+    OBJECT_TYPES = [(TASK, 'Task'), (SUBTASK, 'Subtask'), (CATEGORY, 'Category')]
+
+    tombstone_id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    object_type = models.CharField(max_length=10, choices=OBJECT_TYPES)
+    object_id = models.IntegerField()
+    removed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'removed_at'], name='tombstone_user_removed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id} removed at {self.removed_at}"
+
 class Subscription(models.Model):
     subscription_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subscriptions')
@@ -86,6 +212,16 @@ class Subscription(models.Model):
     latest_yookassa_payment_id = models.CharField(max_length=100, blank=True, null=True)
     yookassa_payment_method_id = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            BrinIndex(fields=['start_date'], name='subscription_start_date_brin'),
+            # Список подписок в дашборде: постраничный вывод по ключу (start_date, subscription_id)
+            models.Index(fields=['-start_date', '-subscription_id'], name='subscription_start_idx'),
+            models.Index(fields=['is_active', '-start_date', '-subscription_id'], name='subscription_active_start_idx'),
+            # Истечение подписок (subscription.tasks.expire_subscriptions) и выбор подписок к автосписанию
+            models.Index(fields=['is_active', 'end_date'], name='subscription_active_end_idx'),
+        ]
+
     def __str__(self):
         return f"Subscription for {self.user.email} from {self.start_date.date()} to {self.end_date.date()}"
 
@@ -98,6 +234,7 @@ class Subscription(models.Model):
         if yk_payment_method_id_from_payment:
             self.yookassa_payment_method_id = yk_payment_method_id_from_payment
         self.save()
+        self.invalidate_entitlement()
 
     def renew_subscription(self, yk_renewal_payment_id):
         """Продлевает подписку после успешного автосписания."""
@@ -105,8 +242,111 @@ class Subscription(models.Model):
         self.end_date += relativedelta(months=1)
         self.latest_yookassa_payment_id = yk_renewal_payment_id
         self.save()
+        self.invalidate_entitlement()
 
     def deactivate(self):
         """Деактивирует подписку."""
         self.is_active = False
-        self.save()
\ No newline at end of file
+        self.save()
+        self.invalidate_entitlement()
+
+    def invalidate_entitlement(self):
+        """Сбрасывает кэш подписки пользователя (subscription.cache) во всех процессах."""
+        from subscription.cache import invalidate_entitlement  # subscription.cache импортирует модели
+        invalidate_entitlement(self.user_id)
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Последний снимок метрик для дашборда (см. dashboard.service), хранится одна строка.
+    Обновляется по расписанию, поэтому загрузка дашборда - одно чтение из этой таблицы.
+    """
+    snapshot_id = models.IntegerField(primary_key=True, default=1)
+    data = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    estimated = models.BooleanField(default=False)  # итоги по большим таблицам взяты из статистики планировщика
+
+    def __str__(self):
+        return f"Dashboard snapshot at {self.created_at}"
+
+
+class RecurringChargeRun(models.Model):
+    """
+    Прогресс ежедневного автосписания (subscription.tasks.charge_recurring_subscriptions).
+    После каждой пачки сохраняется последний обработанный subscription_id,
+    поэтому после падения незавершенный запуск за этот день продолжается с того же места.
+    """
+    run_id = models.BigAutoField(primary_key=True)
+    run_date = models.DateField()
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True)
+    last_subscription_id = models.IntegerField(default=0)
+    charged = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Recurring charge run {self.run_date}: {self.charged} charged, {self.failed} failed"
+
+
+
+class SchedulerHeartbeat(models.Model):
+    """
+    Состояние процессов планировщика (manage.py run_scheduler), по строке на процесс.
+    Задачи выполняет только лидер - процесс, удерживающий advisory lock в PostgreSQL,
+    остальные ждут в резерве. Строка обновляется каждые SCHEDULER_HEARTBEAT_INTERVAL секунд.
+    """
+    instance = models.CharField(primary_key=True, max_length=255)  # host:pid
+    is_leader = models.BooleanField(default=False)
+    started_at = models.DateTimeField(default=timezone.now)
+    leader_since = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+    jobs_executed = models.IntegerField(default=0)
+    jobs_failed = models.IntegerField(default=0)
+    last_job_id = models.CharField(max_length=255, null=True)
+    last_job_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"Scheduler {self.instance} ({'leader' if self.is_leader else 'standby'}) at {self.heartbeat_at}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Входящие уведомления ЮKassa. Обработчик вебхука только сохраняет уведомление и сразу отвечает 200,
+    обработка (с запросом к API ЮKassa) идет в фоне - subscription.tasks.process_webhook_events.
+    Повторная доставка того же события по тому же платежу не создает новую строку.
+    """
+    webhook_event_id = models.BigAutoField(primary_key=True)
+    payment_id = models.CharField(max_length=100)
+    event = models.CharField(max_length=64)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(null=True)
+
+    class Meta:
+        unique_together = ('payment_id', 'event')
+        indexes = [
+            # Очередь необработанных событий для фонового обработчика
+            models.Index(fields=['webhook_event_id'], condition=Q(processed_at__isnull=True),
+                         name='webhook_event_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Webhook {self.event} for payment {self.payment_id}"
+
+
+class SuggestionCacheEntry(models.Model):
+    """
+    Общий для всех процессов уровень кэша ответов GigaChat (suggestion.cache).
+    Ключ - sha256 от вида подсказки, версии промпта и нормализованного текста задачи.
+    """
+    key = models.CharField(primary_key=True, max_length=64)
+    kind = models.CharField(max_length=16)
+    value = models.JSONField(null=True)
+    latency = models.FloatField(default=0)  # сколько секунд занял запрос к GigaChat
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Suggestion cache {self.kind} {self.key[:8]} until {self.expires_at}"
@@ -1,37 +1,171 @@
 import logging
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from django.utils import timezone
 from django_apscheduler.jobstores import DjangoJobStore
+from django_apscheduler.models import DjangoJobExecution
+from django_apscheduler.util import close_old_connections
 
 from backend import settings
-from subscription.tasks import charge_recurring_subscriptions
+from dashboard.service import refresh_snapshot
+from subscription.tasks import charge_recurring_subscriptions, expire_subscriptions
+from subscription.tasks import process_webhook_events, purge_webhook_events
+from suggestion.cache import purge_suggestion_cache
+from taskbench.models.models import RecurringChargeRun
+from taskbench.services.sync_service import purge_tombstones
 
 logger = logging.getLogger(__name__)
 
-def start_scheduler_for_subscriptions():
+CHARGE_JOB_ID = "daily_subscription_charger"
+CHARGE_HOUR = 3
+
+
+def create_scheduler() -> BackgroundScheduler:
+    """
+    Планировщик со всеми задачами, еще не запущенный. Запускается только в процессе-лидере
+    manage.py run_scheduler, поэтому каждая задача выполняется один раз при любом количестве воркеров и нод.
+    Ежедневным задачам разрешено опоздать на SCHEDULER_MISFIRE_GRACE секунд: если лидер сменился
+    во время запуска, резервный процесс выполнит пропущенную задачу один раз (coalesce).
+    """
     scheduler = BackgroundScheduler(timezone=settings.TIME_ZONE) # Используем TIME_ZONE из settings.py
     scheduler.add_jobstore(DjangoJobStore(), "default")
 
-    job_id = "daily_subscription_charger"
+    scheduler.add_job(
+        run_job,
+        args=[charge_recurring_subscriptions],
+        trigger='cron',
+        hour=str(CHARGE_HOUR),
+        minute='00',
+        id=CHARGE_JOB_ID,
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=settings.SCHEDULER_MISFIRE_GRACE,
+        jobstore="default"
+    )
+    logger.info(f"Task '{CHARGE_JOB_ID}' added and will be started at 03:00.")
 
-    existing_job = scheduler.get_job(job_id, jobstore="default")
-    if existing_job:
-        logger.info(f"Deleting existing task {job_id}.")
-        scheduler.remove_job(job_id, jobstore="default")
+    scheduler.add_job(
+        run_job,
+        args=[expire_subscriptions],
+        trigger='interval',
+        seconds=settings.SUBSCRIPTION_EXPIRY_INTERVAL,
+        id="subscription_expiry_sweep",
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+        jobstore="default"
+    )
+    logger.info(f"Task 'subscription_expiry_sweep' added, interval {settings.SUBSCRIPTION_EXPIRY_INTERVAL} s.")
 
     scheduler.add_job(
-        charge_recurring_subscriptions,
+        run_job,
+        args=[purge_tombstones],
         trigger='cron',
-        hour='3',
+        hour='4',
         minute='00',
-        id=job_id,
+        id="daily_tombstone_purge",
         replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=settings.SCHEDULER_MISFIRE_GRACE,
         jobstore="default"
     )
-    logger.info(f"Task '{job_id}' added and will be started at 03:00.")
+    logger.info("Task 'daily_tombstone_purge' added and will be started at 04:00.")
+
+    scheduler.add_job(
+        run_job,
+        args=[refresh_snapshot],
+        trigger='interval',
+        seconds=settings.DASHBOARD_SNAPSHOT_INTERVAL,
+        id="dashboard_snapshot_refresh",
+        replace_existing=True,
+        coalesce=True,
+        jobstore="default"
+    )
+    logger.info(f"Task 'dashboard_snapshot_refresh' added, interval {settings.DASHBOARD_SNAPSHOT_INTERVAL} s.")
+
+    scheduler.add_job(
+        run_job,
+        args=[process_webhook_events],
+        trigger='interval',
+        seconds=settings.WEBHOOK_POLL_INTERVAL,
+        id="webhook_inbox_consumer",
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+        jobstore="default"
+    )
+    logger.info(f"Task 'webhook_inbox_consumer' added, interval {settings.WEBHOOK_POLL_INTERVAL} s.")
+
+    scheduler.add_job(
+        run_job,
+        args=[purge_webhook_events],
+        trigger='cron',
+        hour='4',
+        minute='30',
+        id="daily_webhook_purge",
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=settings.SCHEDULER_MISFIRE_GRACE,
+        jobstore="default"
+    )
+    logger.info("Task 'daily_webhook_purge' added and will be started at 04:30.")
+
+    scheduler.add_job(
+        run_job,
+        args=[purge_suggestion_cache],
+        trigger='cron',
+        hour='4',
+        minute='15',
+        id="daily_suggestion_cache_purge",
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=settings.SCHEDULER_MISFIRE_GRACE,
+        jobstore="default"
+    )
+    logger.info("Task 'daily_suggestion_cache_purge' added and will be started at 04:15.")
+
+    scheduler.add_job(
+        run_job,
+        args=[purge_job_executions],
+        trigger='cron',
+        hour='4',
+        minute='45',
+        id="daily_job_execution_purge",
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=settings.SCHEDULER_MISFIRE_GRACE,
+        jobstore="default"
+    )
+    logger.info("Task 'daily_job_execution_purge' added and will be started at 04:45.")
+
+    if charge_missed_today():
+        # replace_existing пересчитывает время следующего запуска, поэтому пропущенное сегодня списание
+        # (лидера не было в 03:00 или он упал посреди запуска) ставится отдельной разовой задачей
+        scheduler.add_job(
+            run_job, args=[charge_recurring_subscriptions], id=f"{CHARGE_JOB_ID}_catch_up", replace_existing=True
+        )
+        logger.info(f"Task '{CHARGE_JOB_ID}' was missed today and will be started now.")
+
+    return scheduler
+
+
+@close_old_connections
+def run_job(func):
+    """
+    Обертка всех задач планировщика: задачи выполняются в потоках пула APScheduler, которые живут все время
+    работы процесса, поэтому соединения с базой закрываются до и после каждого запуска, как после HTTP-запроса.
+    """
+    func()
+
+
+def purge_job_executions():
+    """Журнал запусков django_apscheduler: частые задачи (очередь вебхуков) пишут в него тысячи строк в день."""
+    DjangoJobExecution.objects.delete_old_job_executions(max_age=7 * 24 * 3600)
+
 
-    try:
-        scheduler.start()
-        logger.info("APScheduler started.")
-    except Exception as e:
-        logger.error(f"APScheduler start failed: {e}")
\ No newline at end of file
+def charge_missed_today() -> bool:
+    """Автосписание за сегодня должно было начаться, но не завершилось (или не начиналось)."""
+    now = timezone.localtime()
+    if now.hour < CHARGE_HOUR:
+        return False
+    return not RecurringChargeRun.objects.filter(run_date=now.date(), finished_at__isnull=False).exists()
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.http import JsonResponse
 
+from backend import settings
+from taskbench.services.statistics_service import Granularity
+
 class StatisticsSerializer(serializers.Serializer):
     done_today = serializers.IntegerField()
     max_done = serializers.IntegerField()
@@ -14,4 +17,33 @@ def statistics_response(statistics, status=200):
     serializer = StatisticsSerializer(data=statistics)  # Передаем данные через data
     if not serializer.is_valid():
         raise serializers.ValidationError(serializer.errors)
-    return JsonResponse(serializer.data, status=status)
\ No newline at end of file
+    return JsonResponse(serializer.data, status=status)
+
+class StatisticsRangeParametersSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    granularity = serializers.ChoiceField(choices=Granularity.CHOICES, required=False, default=Granularity.DAY)
+
+    def validate(self, data):
+        if data['end'] < data['start']:
+            raise serializers.ValidationError('end must not be earlier than start')
+        if (data['end'] - data['start']).days >= settings.STATISTICS_RANGE_MAX_DAYS:
+            raise serializers.ValidationError(f'Range is too long (max {settings.STATISTICS_RANGE_MAX_DAYS} days)')
+        return data
+
+
+def statistics_range_response(statistics, status=200):
+    data = {
+        **statistics,
+        'start': statistics['start'].isoformat(),
+        'end': statistics['end'].isoformat(),
+        'buckets': [
+            {'start': bucket['start'].isoformat(), 'count': bucket['count']}
+            for bucket in statistics['buckets']
+        ],
+        'streak': {
+            **statistics['streak'],
+            'last_day': statistics['streak']['last_day'].isoformat() if statistics['streak']['last_day'] else None,
+        },
+    }
+    return JsonResponse(data, status=status)
@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+from backend import settings
+
+
+def encode_sync_cursor(moment: datetime) -> str:
+    data = {'t': moment.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_sync_cursor(cursor: str) -> datetime:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        moment = datetime.fromisoformat(data['t'])
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError('Invalid cursor')
+    if moment.tzinfo is None:
+        raise ValidationError('Invalid cursor')
+    return moment
+
+
+def _deadline(deadline):
+    # тот же формат, что и в task_json
+    return deadline.replace(tzinfo=None).isoformat(timespec='seconds') if deadline is not None else None
+
+
+# Строки отдаются массивами, а не объектами: так ответ в несколько раз меньше
+_ROWS = {
+    'categories': lambda row: row,
+    'tasks': lambda row: (row[0], row[1], _deadline(row[2]), row[3], row[4] or 0),
+    'subtasks': lambda row: row,
+    'deleted': lambda row: row,
+}
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _stream(changes):
+    yield f'{{"cursor":{_dumps(encode_sync_cursor(changes["cursor"]))},"reset":{_dumps(changes["reset"])}'
+    for key, row_json in _ROWS.items():
+        yield f',"{key}":['
+        separator = ''
+        for row in changes[key].iterator(chunk_size=settings.SYNC_CHUNK_SIZE):
+            yield separator + _dumps(row_json(row))
+            separator = ','
+        yield ']'
+    yield '}'
+
+
+def sync_response(changes):
+    """
+    Потоковый ответ GET /sync/: строки читаются из базы пачками по SYNC_CHUNK_SIZE
+    и сразу отправляются клиенту, весь ответ в памяти не собирается.
+    {
+        "cursor": "...", "reset": false,
+        "categories": [[category_id, name], ...],
+        "tasks": [[task_id, content, deadline, priority, category_id], ...],
+        "subtasks": [[subtask_id, task_id, content, is_done], ...],
+        "deleted": [["task" | "subtask" | "category", id], ...]
+    }
+    """
+    return StreamingHttpResponse(_stream(changes), content_type='application/json')
@@ -1,5 +1,9 @@
+import base64
+import json
+from datetime import datetime
 from enum import Enum
 
+from django.db.models import prefetch_related_objects
 from django.http import JsonResponse
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
@@ -22,17 +26,56 @@ def match_sort(sort_by: str | None) -> Sort:
     return Sort.DEFAULT
 
 
-def task_list_response(tasks):
-    data = []
-    for task in tasks:
-        category = task.task_categories.first().category if task.task_categories.first() else None
-        data.append(task_json(task, category, task.subtasks.all()))
-    return JsonResponse(data, safe=False)
+def encode_task_cursor(sort_by: Sort, task) -> str:
+    """Курсор для постраничного вывода: ключ сортировки последней задачи на странице."""
+    data = {
+        's': sort_by.value,
+        'p': task.priority,
+        'd': task.deadline.isoformat() if task.deadline is not None else None,
+        'id': task.task_id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_task_cursor(cursor: str) -> dict:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return {
+            'sort_by': match_sort(data['s']),
+            'priority': int(data['p']),
+            'deadline': datetime.fromisoformat(data['d']) if data['d'] is not None else None,
+            'task_id': int(data['id']),
+        }
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError('Invalid cursor')
+
+
+def task_category(task):
+    """
+    Категория задачи. Берется из prefetch_related('task_categories__category'),
+    поэтому, в отличие от .first(), не делает запросов на каждую задачу.
+    """
+    links = task.task_categories.all()
+    return min(links, key=lambda link: link.taskcategory_id).category if links else None
+
+
+def task_list_response(tasks, next_cursor=None):
+    data = [task_json(task, task_category(task), task.subtasks.all()) for task in tasks]
+    response = JsonResponse(data, safe=False)
+    if next_cursor is not None:
+        response['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def task_batch_response(tasks, status):
+    prefetch_related_objects(tasks, 'subtasks', 'task_categories__category')
+    data = [task_json(task, task_category(task), task.subtasks.all()) for task in tasks]
+    return JsonResponse(data, safe=False, status=status)
 
 
 def task_response(task, status):
-    category = task.task_categories.first().category if task.task_categories.first() else None
-    return JsonResponse(task_json(task, category, task.subtasks.all()), safe=False, status=status)
+    prefetch_related_objects([task], 'subtasks', 'task_categories__category')
+    return JsonResponse(task_json(task, task_category(task), task.subtasks.all()), safe=False, status=status)
 
 
 def task_json(task, category, subtasks):
@@ -75,6 +118,7 @@ class TaskSearchParametersSerializer(serializers.Serializer):
     date = serializers.DateTimeField(required=False, allow_null=True)
     offset = serializers.IntegerField(required=False, allow_null=True, default=0)
     limit = serializers.IntegerField(required=False, allow_null=True, default=10)
+    cursor = serializers.CharField(required=False, allow_null=True, allow_blank=True)
 
     def validate(self, data):
         validated_data = {'sort_by': match_sort(data.get('sort_by'))}
@@ -102,5 +146,6 @@ class TaskSearchParametersSerializer(serializers.Serializer):
         validated_data['offset'] = data.get('offset') if data.get('offset') is not None else 0
         validated_data['limit'] = data.get('limit') if data.get('limit') is not None else 10
         validated_data['category_id'] = data.get('category_id')
+        validated_data['cursor'] = decode_task_cursor(data['cursor']) if data.get('cursor') else None
 
         return validated_data
@@ -0,0 +1,117 @@
+import atexit
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import connection, connections
+from django.utils import timezone
+
+from backend import settings
+from taskbench.models.models import User, UserActivityDay
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTracker:
+    """
+    Буфер для User.access_at.
+    Вместо UPDATE на каждый запрос время последнего обращения копится в памяти процесса
+    и периодически сбрасывается в базу одним запросом UPDATE ... FROM (VALUES ...).
+    - flush_interval: период сброса в секундах, 0 - писать сразу;
+    - granularity: если сохраненное access_at новее этого порога (в секундах), запись пропускается, 0 - не пропускать.
+    Первое обращение за день пишется сразу вместе с UserActivityDay, поэтому счетчики active_users_*
+    и временной ряд активных пользователей в дашборде остаются точными.
+    """
+
+    def __init__(self, flush_interval: int, granularity: int):
+        self.flush_interval = flush_interval
+        self.granularity = timedelta(seconds=granularity)
+        self._lock = threading.Lock()
+        self._pending = {}  # user_id -> access_at, еще не записанные в базу
+        self._seen = {}  # user_id -> последнее учтенное access_at в этом процессе
+        self._timer = None
+        atexit.register(self.flush)
+
+    def touch(self, user: User):
+        now = timezone.now()
+        with self._lock:
+            last = self._seen.get(user.user_id)
+            if user.access_at is not None and (last is None or user.access_at > last):
+                last = user.access_at
+
+            same_day = last is not None and timezone.localdate(last) == timezone.localdate(now)
+            if same_day and self.granularity and now - last < self.granularity:
+                return
+
+            self._seen[user.user_id] = now
+            buffered = same_day and self.flush_interval > 0
+            if buffered:
+                self._pending[user.user_id] = now
+                self._schedule()
+            else:
+                self._pending.pop(user.user_id, None)
+        user.access_at = now
+
+        if not buffered:
+            User.objects.filter(user_id=user.user_id).update(access_at=now)
+        if not same_day:
+            UserActivityDay.objects.bulk_create(
+                [UserActivityDay(user_id=user.user_id, day=timezone.localdate(now))], ignore_conflicts=True
+            )
+
+    def flush(self) -> int:
+        """Записывает накопленные значения одним запросом. Возвращает количество пользователей в пачке."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._prune()
+        if not pending:
+            return 0
+
+        values = ', '.join(['(%s, %s::timestamptz)'] * len(pending))
+        params = [item for pair in pending.items() for item in pair]
+        table = User._meta.db_table
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE "{table}" AS u SET access_at = v.access_at '
+                    f'FROM (VALUES {values}) AS v(user_id, access_at) '
+                    f'WHERE u.user_id = v.user_id AND (u.access_at IS NULL OR u.access_at < v.access_at)',
+                    params
+                )
+        except Exception as e:
+            logger.error(f"Failed to flush access_at for {len(pending)} users: {e}")
+            return 0
+        logger.debug(f"Flushed access_at for {len(pending)} users")
+        return len(pending)
+
+    def _prune(self):
+        # Старые отметки больше не влияют на пропуск записи, чтобы словарь не рос бесконечно
+        threshold = timezone.now() - self.granularity
+        self._seen = {user_id: seen for user_id, seen in self._seen.items() if seen >= threshold}
+
+    def _schedule(self):
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(self.flush_interval, self._run_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run_timer(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+            with self._lock:
+                self._timer = None
+                if self._pending:
+                    self._schedule()
+
+
+access_tracker = AccessTracker(
+    flush_interval=settings.ACCESS_AT_FLUSH_INTERVAL,
+    granularity=settings.ACCESS_AT_GRANULARITY,
+)
+
+
+def track_access(user: User):
+    access_tracker.touch(user)
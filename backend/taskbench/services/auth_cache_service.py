@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from backend import settings
+from taskbench.models.models import User
+from taskbench.utils import notifications
+
+INVALIDATION_CHANNEL = 'taskbench_auth_invalidate'
+
+_USER_FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+
+class TokenCache:
+    """
+    LRU-кэш проверенных access-токенов с ограничением по времени жизни.
+    Ключ - sha256 от токена, значение - claims токена и снимок полей пользователя,
+    поэтому повторный запрос с тем же токеном не проверяет подпись и не ходит в базу за User.
+    Запись живет не дольше exp токена и не дольше ttl секунд.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # digest -> (expires_at, claims, snapshot)
+        self._digests_by_user = {}  # user_id -> set(digest)
+
+    def get(self, token: str) -> User | None:
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            snapshot = entry[2]
+        return User.from_db('default', _USER_FIELDS, [snapshot[name] for name in _USER_FIELDS])
+
+    def put(self, token: str, claims: dict, user: User):
+        if self.max_size <= 0:
+            return
+        expires_at = min(claims['exp'], time.time() + self.ttl)
+        snapshot = {name: getattr(user, name) for name in _USER_FIELDS}
+        digest = self._digest(token)
+        with self._lock:
+            self._remove(digest)
+            self._entries[digest] = (expires_at, claims, snapshot)
+            self._digests_by_user.setdefault(user.user_id, set()).add(digest)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for digest in self._digests_by_user.pop(user_id, set()):
+                self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _remove(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        user_id = entry[2]['user_id']
+        digests = self._digests_by_user.get(user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._digests_by_user[user_id]
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+
+token_cache = TokenCache(max_size=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+
+def invalidate_user_tokens(user_id: int):
+    """Сбрасывает кэш токенов пользователя во всех процессах."""
+    notifications.publish(INVALIDATION_CHANNEL, str(user_id))
+
+
+def _on_invalidate(payload):
+    if payload is None:
+        token_cache.clear()
+    else:
+        token_cache.invalidate_user(int(payload))
+
+
+notifications.subscribe(INVALIDATION_CHANNEL, _on_invalidate)
@@ -1,15 +1,16 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
-from taskbench.models.models import Category, TaskCategory
+from taskbench.models.models import Category, Task, TaskCategory, Tombstone
 from taskbench.serializers.category_serializers import CategorySerializer
-from taskbench.services.user_service import get_user
+from taskbench.services.version_service import bump_data_version
 from taskbench.utils.exceptions import AlreadyExists
-from taskbench.utils.exceptions import NotFound, AuthenticationError
+from taskbench.utils.exceptions import NotFound
 
 
 
-def get_category_list(token):
-    user = get_user(token)
+def get_category_list(user):
     return Category.objects.filter(user=user)
 
 
@@ -20,21 +21,20 @@ def get_category(user, category_id):
         raise NotFound("Category not found or access denied")
 
 
-def create_category(token, data):
+def create_category(user, data):
     serializer = CategorySerializer(data=data)
-    user = get_user(token)
     if serializer.is_valid():
         category_name = serializer.validated_data["name"]
         if Category.objects.filter(name=category_name, user=user).exists():
             raise AlreadyExists("Category already exists")
         category = Category.objects.create(name=category_name, user=user)
+        bump_data_version(user)
         return category
     else:
         raise ValidationError(serializer.errors)
 
 
-def update_category(token, category_id, data):
-    user = get_user(token)
+def update_category(user, category_id, data):
     category = get_category(user, category_id)  # Проверяем существование и доступ
     serializer = CategorySerializer(data=data)
     if serializer.is_valid():
@@ -43,16 +43,21 @@ def update_category(token, category_id, data):
             raise AlreadyExists("Category with this name already exists")
         category.name = category_name
         category.save()
+        bump_data_version(user)
         return category
     else:
         raise ValidationError(serializer.errors)
 
 
-def delete_category(token, category_id):
-    user = get_user(token)
+def delete_category(user, category_id):
     category = get_category(user, category_id)  # Проверяем существование и доступ
-    # Удаляем все связи в TaskCategory, но не таски
-    TaskCategory.objects.filter(category=category).delete()
-    category.delete()
+    with transaction.atomic():
+        # У задач меняется категория, поэтому они попадут в следующий GET /sync/
+        Task.objects.filter(task_categories__category=category).update(updated_at=timezone.now())
+        # Удаляем все связи в TaskCategory, но не таски
+        TaskCategory.objects.filter(category=category).delete()
+        Tombstone.objects.create(user=user, object_type=Tombstone.CATEGORY, object_id=category.category_id)
+        category.delete()
+    bump_data_version(user)
     return {"message": "Category deleted successfully"}
 
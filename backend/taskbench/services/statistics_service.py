@@ -1,16 +1,140 @@
 import logging
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 
-from django.db.models import Count
+from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncWeek, TruncMonth
 from django.utils import timezone
 
-from taskbench.models.models import Task
-from taskbench.services.user_service import get_user
+from taskbench.models.models import Task, DailyCompletion, CompletionStreak
 
 logger = logging.getLogger(__name__)
 
 
-def get_statistics(token):
+def completed_tasks_by_day(user, first_day, last_day):
+    """
+    Количество выполненных задач по дням в промежутке [first_day, last_day].
+    Фильтр по границам completed_at, а не по completed_at__date, чтобы работал индекс task_completed_at_idx.
+    """
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return (
+        Task.objects
+        .filter(
+            user=user,
+            is_completed=True,
+            completed_at__gte=start,
+            completed_at__lt=end
+        )
+        .values('completed_at__date')
+        .annotate(count=Count('task_id'))
+    )
+
+
+def daily_completions(user, first_day, last_day) -> dict:
+    """Количество выполненных задач по дням из DailyCompletion: {дата: количество}, дни без задач пропущены."""
+    rows = DailyCompletion.objects.filter(user=user, day__gte=first_day, day__lte=last_day).values_list('day', 'count')
+    return dict(rows)
+
+
+def record_completion(user, completed_at):
+    """Увеличивает счетчик выполненных задач за день и серию дней. Вызывается в транзакции complete_task."""
+    day = timezone.localdate(completed_at)
+    rollup, streak = DailyCompletion._meta.db_table, CompletionStreak._meta.db_table
+    # В SET все ссылки на s.* - значения до обновления: тот же день серию не меняет,
+    # следующий день продолжает ее, после пропуска серия начинается заново
+    next_current = (
+        'CASE WHEN s.last_day >= EXCLUDED.last_day THEN s.current '
+        'WHEN s.last_day = EXCLUDED.last_day - 1 THEN s.current + 1 ELSE 1 END'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO "{rollup}" AS d (user_id, day, count) VALUES (%s, %s, 1) '
+            f'ON CONFLICT (user_id, day) DO UPDATE SET count = d.count + 1',
+            [user.user_id, day]
+        )
+        cursor.execute(
+            f'INSERT INTO "{streak}" AS s (user_id, current, longest, last_day) VALUES (%s, 1, 1, %s) '
+            f'ON CONFLICT (user_id) DO UPDATE SET current = {next_current}, '
+            f'longest = GREATEST(s.longest, {next_current}), last_day = GREATEST(s.last_day, EXCLUDED.last_day)',
+            [user.user_id, day]
+        )
+
+
+def get_streak(user) -> dict:
+    """Текущая и самая длинная серия дней с выполненными задачами."""
+    streak = CompletionStreak.objects.filter(user_id=user.user_id).first()
+    if streak is None:
+        return {'current': 0, 'longest': 0, 'last_day': None}
+    yesterday = timezone.localdate() - timedelta(days=1)
+    return {
+        'current': streak.current if streak.last_day >= yesterday else 0,
+        'longest': streak.longest,
+        'last_day': streak.last_day,
+    }
+
+
+class Granularity:
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    CHOICES = [DAY, WEEK, MONTH]
+
+
+def _bucket_start(day, granularity):
+    if granularity == Granularity.WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == Granularity.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_step(granularity):
+    if granularity == Granularity.WEEK:
+        return relativedelta(weeks=1)
+    if granularity == Granularity.MONTH:
+        return relativedelta(months=1)
+    return relativedelta(days=1)
+
+
+def get_statistics_range(user, first_day, last_day, granularity=Granularity.DAY):
+    """
+    Выполненные задачи за [first_day, last_day] по дням, неделям (с понедельника) или месяцам и серия дней.
+    Читает только DailyCompletion (не больше одной строки на день промежутка), поэтому время ответа
+    не зависит от количества выполненных задач. Пустые промежутки возвращаются с count=0.
+    """
+    rows = DailyCompletion.objects.filter(user=user, day__gte=first_day, day__lte=last_day)
+    if granularity == Granularity.DAY:
+        counts = dict(rows.values_list('day', 'count'))
+    else:
+        trunc = TruncWeek if granularity == Granularity.WEEK else TruncMonth
+        counts = dict(
+            rows.annotate(bucket=trunc('day'))
+            .values('bucket')
+            .annotate(total=Sum('count'))
+            .values_list('bucket', 'total')
+        )
+
+    buckets = []
+    step = _bucket_step(granularity)
+    bucket = _bucket_start(first_day, granularity)
+    while bucket <= last_day:
+        buckets.append({'start': bucket, 'count': counts.get(bucket, 0)})
+        bucket += step
+
+    return {
+        'start': first_day,
+        'end': last_day,
+        'granularity': granularity,
+        'total': sum(item['count'] for item in buckets),
+        'max': max((item['count'] for item in buckets), default=0),
+        'buckets': buckets,
+        'streak': get_streak(user),
+    }
+
+
+def get_statistics(user):
     """
     Возвращает статистику продуктивности для пользователя:
     - done_today: количество задач, выполненных сегодня
@@ -18,35 +142,18 @@ def get_statistics(token):
     - weekly: массив из 7 значений (float 0.0-1.0) с понедельника по воскресенье
     """
 
-    user = get_user(token)
-
     # Определяем начало текущей недели (понедельник)
     today = timezone.now().date()
     start_of_week = today - timedelta(days=today.weekday())
     logger.debug(f"Calculating statistics for user {user.email}, week starting {start_of_week}")
 
-    # Получаем задачи за неделю
+    # Словарь дата -> количество задач за неделю, не больше 7 строк из DailyCompletion
     try:
-        tasks_by_day = (
-            Task.objects
-            .filter(
-                user=user,
-                is_completed=True,
-                completed_at__date__gte=start_of_week,
-                completed_at__date__lte=today
-            )
-            .values('completed_at__date')
-            .annotate(count=Count('task_id'))
-        )
+        count_by_date = daily_completions(user, start_of_week, today)
     except Exception as e:
         logger.error(f"Error querying tasks: {str(e)}")
         raise
 
-    # Формируем словарь: дата -> количество задач
-    count_by_date = {
-        item['completed_at__date']: item['count']
-        for item in tasks_by_day
-    }
     logger.debug(f"Tasks by day: {count_by_date}")
 
     # Формируем массив из 7 дней, начиная с понедельника
@@ -1,8 +1,9 @@
+from django.db import transaction
 from rest_framework.exceptions import ValidationError
 
-from taskbench.models.models import Subtask
+from taskbench.models.models import Subtask, Tombstone
 from taskbench.services.task_service import get_task
-from taskbench.services.user_service import get_user
+from taskbench.services.version_service import bump_data_version
 from taskbench.utils.exceptions import NotFound
 
 
@@ -12,8 +13,7 @@ def get_subtask(subtask_id, user):
     except Subtask.DoesNotExist:
         raise NotFound("Subtask not found")
 
-def create_subtask(token, task_id, data):
-    user = get_user(token)
+def create_subtask(user, task_id, data):
     task = get_task(user=user, task_id=task_id)
 
     content = data.get('content')
@@ -22,14 +22,15 @@ def create_subtask(token, task_id, data):
     if not content:
         raise ValidationError('Content cannot be empty')
 
-    return Subtask.objects.create(
+    subtask = Subtask.objects.create(
         text=content,
         task=task,
         is_completed=is_done
     )
+    bump_data_version(user)
+    return subtask
 
-def update_subtask(subtask_id, token, data):
-    user = get_user(token)
+def update_subtask(user, subtask_id, data):
     subtask = get_subtask(subtask_id, user)
 
     if 'content' in data:
@@ -38,9 +39,12 @@ def update_subtask(subtask_id, token, data):
         subtask.is_completed = data['is_done']
 
     subtask.save()
+    bump_data_version(user)
     return subtask
 
-def delete_subtask(token, subtask_id):
-    user = get_user(token)
+def delete_subtask(user, subtask_id):
     subtask = get_subtask(subtask_id, user)
-    subtask.delete()
\ No newline at end of file
+    with transaction.atomic():
+        Tombstone.objects.create(user=user, object_type=Tombstone.SUBTASK, object_id=subtask.subtask_id)
+        subtask.delete()
+    bump_data_version(user)
\ No newline at end of file
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from backend import settings
+from taskbench.models.models import Task, Subtask, Category, TaskCategory, Tombstone
+
+
+def get_changes(user, since=None) -> dict:
+    """
+    Изменения данных пользователя для GET /sync/ в виде ленивых querysets (читаются при отправке ответа).
+    Без since или со слишком старым since (надгробия уже удалены) возвращает все данные и reset=True.
+    Строки, измененные в последние SYNC_OVERLAP секунд до since, отдаются повторно: транзакция
+    могла записать updated_at раньше, а закоммититься позже предыдущей синхронизации.
+    """
+    now = timezone.now()
+    reset = since is None or since < now - timedelta(days=settings.SYNC_TOMBSTONE_TTL_DAYS)
+
+    tasks = Task.objects.filter(user=user, is_completed=False)
+    subtasks = Subtask.objects.filter(task__user=user, task__is_completed=False)
+    categories = Category.objects.filter(user=user)
+    tombstones = Tombstone.objects.filter(user=user)
+
+    if reset:
+        tombstones = tombstones.none()
+    else:
+        threshold = since - timedelta(seconds=settings.SYNC_OVERLAP)
+        tasks = tasks.filter(updated_at__gt=threshold)
+        subtasks = subtasks.filter(updated_at__gt=threshold)
+        categories = categories.filter(updated_at__gt=threshold)
+        tombstones = tombstones.filter(removed_at__gt=threshold)
+
+    # Как и в task_category(): категория задачи - связь с наименьшим taskcategory_id
+    first_category = TaskCategory.objects.filter(task=OuterRef('pk')).order_by('taskcategory_id')
+
+    return {
+        'cursor': now,
+        'reset': reset,
+        'categories': categories.order_by('category_id').values_list('category_id', 'name'),
+        'tasks': tasks.annotate(category_id=Subquery(first_category.values('category_id')[:1]))
+                      .order_by('task_id')
+                      .values_list('task_id', 'title', 'deadline', 'priority', 'category_id'),
+        'subtasks': subtasks.order_by('subtask_id').values_list('subtask_id', 'task_id', 'text', 'is_completed'),
+        'deleted': tombstones.order_by('tombstone_id').values_list('object_type', 'object_id'),
+    }
+
+
+def purge_tombstones() -> int:
+    """Удаляет надгробия старше SYNC_TOMBSTONE_TTL_DAYS. Клиенты с более старым курсором получат reset."""
+    threshold = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_TTL_DAYS)
+    deleted, _ = Tombstone.objects.filter(removed_at__lt=threshold).delete()
+    return deleted
@@ -1,10 +1,14 @@
+from django.db import transaction
+from django.db.models import Q
 from django.utils.dateparse import parse_datetime
 from rest_framework.exceptions import ValidationError
 from django.utils import timezone
 
-from taskbench.models.models import Task, Category, TaskCategory, Subtask
-from taskbench.serializers.task_serializers import TaskSearchParametersSerializer, Sort
-from taskbench.services.user_service import get_user
+from backend import settings
+from taskbench.models.models import Task, Category, TaskCategory, Subtask, Tombstone
+from taskbench.serializers.task_serializers import TaskSearchParametersSerializer, Sort, encode_task_cursor
+from taskbench.services.statistics_service import record_completion
+from taskbench.services.version_service import bump_data_version
 from taskbench.utils.exceptions import NotFound
 
 
@@ -22,18 +26,23 @@ def get_category(user, category_id):
         raise NotFound('Category not found or access denied')
 
 
-def get_task_list(token, params):
+def get_task_list(user, params):
+    """
+    Возвращает страницу задач и курсор следующей страницы (None, если это последняя страница).
+    Если передан cursor, страница начинается сразу после задачи из курсора (keyset),
+    иначе используется старая пагинация через offset.
+    """
     params_serializer = TaskSearchParametersSerializer(data=params)
 
     if not params_serializer.is_valid():
         raise ValidationError('Invalid params')
 
-    user = get_user(token)
     params = params_serializer.validated_data
 
-    sort_by = params['sort_by']
+    sort_by = Sort.DEADLINE if params['sort_by'] == Sort.DEADLINE else Sort.PRIORITY
     limit = params['limit']
     offset = params['offset']
+    cursor = params['cursor']
     filters = {
         'user': user,
         'is_completed': False,
@@ -46,59 +55,143 @@ def get_task_list(token, params):
 
     tasks = Task.objects.filter(**filters).prefetch_related('subtasks', 'task_categories__category')
 
-    if sort_by == Sort.PRIORITY or sort_by == Sort.DEFAULT:
+    if sort_by == Sort.PRIORITY:
         tasks = tasks.order_by('-priority', 'deadline', 'task_id')
     elif sort_by == Sort.DEADLINE:
         tasks = tasks.order_by('deadline', '-priority', 'task_id')
 
-    tasks = tasks[offset:offset + limit]
-
-    return tasks
-
-
-def create_task(token, data):
-    user = get_user(token)
-    content = data.get('content')
-    dpc = data.get('dpc', {})
-    subtasks = data.get('subtasks', [])
-
-    if not content:
-        raise ValidationError('Missing required field: content')
-
-    task = Task.objects.create(
-        title=content,
-        deadline=parse_datetime(dpc.get('deadline')) if dpc.get('deadline') else None,
-        priority=dpc.get('priority', 0),
-        user=user,
-        is_completed=False
-    )
-    if 'category_id' in dpc:
-        category = get_category(user=user, category_id=dpc['category_id'])
-        TaskCategory.objects.create(task=task, category=category)
+    if cursor is not None:
+        if cursor['sort_by'] != sort_by:
+            raise ValidationError('Cursor does not match sort_by')
+        tasks = after_cursor(tasks, sort_by, cursor, limit + 1)
+        offset = 0
+
+    # Берем на одну задачу больше, чтобы понять, есть ли следующая страница
+    tasks = list(tasks[offset:offset + limit + 1])
+    next_cursor = encode_task_cursor(sort_by, tasks[limit - 1]) if len(tasks) > limit > 0 else None
+
+    return tasks[:limit], next_cursor
+
+
+def after_cursor(tasks, sort_by, cursor, size):
+    """
+    Первые size задач строго после задачи из курсора для сортировок
+    (-priority, deadline, task_id) и (deadline, -priority, task_id).
+    deadline сортируется по возрастанию, NULL в PostgreSQL идут последними.
+    Условие "после курсора" разбито на ветки UNION ALL, каждая из которых - только AND-условия в порядке индекса
+    task_open_priority_idx / task_open_deadline_idx, поэтому PostgreSQL начинает чтение индекса прямо с позиции
+    курсора и берет из каждой ветки не больше size строк: глубокая страница стоит столько же, сколько первая.
+    """
+    priority, deadline, task_id = cursor['priority'], cursor['deadline'], cursor['task_id']
+
+    if sort_by == Sort.DEADLINE:
+        if deadline is None:
+            branches = [Q(deadline__isnull=True, priority=priority, task_id__gt=task_id),
+                        Q(deadline__isnull=True, priority__lt=priority)]
+        else:
+            branches = [Q(deadline=deadline, priority=priority, task_id__gt=task_id),
+                        Q(deadline=deadline, priority__lt=priority),
+                        Q(deadline__gt=deadline),
+                        Q(deadline__isnull=True)]
+    else:
+        if deadline is None:
+            branches = [Q(priority=priority, deadline__isnull=True, task_id__gt=task_id)]
+        else:
+            branches = [Q(priority=priority, deadline=deadline, task_id__gt=task_id),
+                        Q(priority=priority, deadline__gt=deadline),
+                        Q(priority=priority, deadline__isnull=True)]
+        branches.append(Q(priority__lt=priority))
+
+    first, *rest = [tasks.filter(branch)[:size] for branch in branches]
+    return first.union(*rest, all=True).order_by(*tasks.query.order_by)
+
+
+def create_task(user, data):
+    return create_tasks(user, [data])[0]
+
+
+def create_tasks(user, items):
+    """
+    Создает несколько задач вместе с подзадачами и категориями в одной транзакции.
+    Количество запросов не зависит от размера пачки: категории проверяются одним запросом,
+    задачи, связи с категориями и подзадачи вставляются через bulk_create.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValidationError('Expected a non-empty list of tasks')
+    if len(items) > settings.TASK_BATCH_MAX_SIZE:
+        raise ValidationError(f'Too many tasks in one batch (max {settings.TASK_BATCH_MAX_SIZE})')
+
+    tasks, category_ids, subtask_texts = [], [], []
+    for data in items:
+        if not isinstance(data, dict):
+            raise ValidationError('Invalid task')
+        content = data.get('content')
+        dpc = data.get('dpc') or {}
+        subtasks = data.get('subtasks') or []
+
+        if not content:
+            raise ValidationError('Missing required field: content')
+        if any(not isinstance(subtask, dict) or not subtask.get('content') for subtask in subtasks):
+            raise ValidationError('Missing required field: subtasks.content')
+        try:
+            priority = int(dpc.get('priority', 0))
+        except (TypeError, ValueError):
+            raise ValidationError('Invalid priority')
 
-    for subtask_data in subtasks:
-        Subtask.objects.create(
-            text=subtask_data['content'],
-            task=task,
+        tasks.append(Task(
+            title=content,
+            deadline=parse_datetime(dpc.get('deadline')) if dpc.get('deadline') else None,
+            priority=priority,
+            user=user,
             is_completed=False
-        )
+        ))
+        if 'category_id' in dpc:
+            try:
+                category_ids.append(int(dpc['category_id']))
+            except (TypeError, ValueError):
+                raise NotFound('Category not found or access denied')
+        else:
+            category_ids.append(None)
+        subtask_texts.append([subtask['content'] for subtask in subtasks])
+
+    requested = {category_id for category_id in category_ids if category_id is not None}
+    categories = {}
+    if requested:
+        categories = Category.objects.filter(user=user).in_bulk(requested)
+        if len(categories) != len(requested):
+            raise NotFound('Category not found or access denied')
+
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks)
+        TaskCategory.objects.bulk_create([
+            TaskCategory(task=task, category=categories[category_id])
+            for task, category_id in zip(tasks, category_ids) if category_id is not None
+        ])
+        Subtask.objects.bulk_create([
+            Subtask(text=text, task=task, is_completed=False)
+            for task, texts in zip(tasks, subtask_texts) for text in texts
+        ])
+        bump_data_version(user)
 
-    return task
+    return tasks
 
 
-def complete_task(token, task_id):
-    user = get_user(token)
+def complete_task(user, task_id):
     task = get_task(user=user, task_id=task_id)
     if task.is_completed:
         raise ValidationError('Task already completed')
     task.is_completed = True
     task.completed_at = timezone.now()  # Устанавливаем текущую дату и время
-    task.save()
+    with transaction.atomic():
+        task.save()
+        record_completion(user, task.completed_at)
+        # для GET /sync/ выполненная задача удаляется из списка
+        Tombstone.objects.create(user=user, object_type=Tombstone.TASK, object_id=task.task_id)
+    bump_data_version(user)
     return task
 
 
-def update_task(token, task_id, data):
-    user = get_user(token)
+def update_task(user, task_id, data):
     task = get_task(user=user, task_id=task_id)
 
     if task is None:
@@ -111,6 +204,7 @@ def update_task(token, task_id, data):
         task.title = content
     if not dpc:
         task.save()
+        bump_data_version(user)
         return task
 
     if 'deadline' in dpc:
@@ -129,4 +223,5 @@ def update_task(token, task_id, data):
         except NotFound:
             raise ValidationError('Category not found or access denied')
     task.save()
+    bump_data_version(user)
     return task
@@ -1,10 +1,13 @@
 from django.http import HttpRequest
-from django.utils import timezone
 from rest_framework.exceptions import ValidationError
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
 
+from backend import settings
 from taskbench.models.models import User
 from taskbench.serializers.user_serializers import JwtSerializer, UserRegisterSerializer, LoginSerializer
+from taskbench.services.access_service import track_access
+from taskbench.services.auth_cache_service import token_cache, invalidate_user_tokens
 from taskbench.utils.exceptions import AuthenticationError
 
 
@@ -14,13 +17,25 @@ def get_token(request: HttpRequest):
     return {'token': token}
 
 
+def authenticate_token(token: str) -> User:
+    """Проверяет подпись и срок действия токена и возвращает его пользователя."""
+    user = token_cache.get(token)
+    if user is None:
+        try:
+            decoded = UntypedToken(token)
+            user = User.objects.get(user_id=decoded.payload.get(settings.SIMPLE_JWT['USER_ID_CLAIM']))
+        except (TokenError, User.DoesNotExist):
+            raise AuthenticationError('Invalid token or user.')
+        token_cache.put(token, decoded.payload, user)
+    track_access(user)
+    return user
+
+
 def get_user(token):
-    # token = get_token(request)
     serializer = JwtSerializer(data=token)
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        user.access_at = timezone.now()
-        user.save()
+        track_access(user)
         return user
     else:
         raise AuthenticationError(str(serializer.errors))
@@ -62,13 +77,13 @@ def token_refresh(token):
     return user, refresh, access
 
 
-def delete_user(token):
-    user = get_user(token)
+def delete_user(user):
+    user_id = user.user_id
     user.delete()
+    invalidate_user_tokens(user_id)
 
 
-def change_password(token, data):
-    user = get_user(token)
+def change_password(user, data):
     old_password = data.get('old_password')
     new_password = data.get('new_password')
     if not old_password or not new_password:
@@ -79,6 +94,7 @@ def change_password(token, data):
 
     try:
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password_hash'])
     except Exception as e:
         raise ValidationError(str(e))
+    invalidate_user_tokens(user.user_id)
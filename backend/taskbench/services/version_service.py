@@ -0,0 +1,22 @@
+from django.db import connection
+
+from taskbench.models.models import UserDataVersion
+
+
+def get_data_version(user) -> int:
+    versions = UserDataVersion.objects.filter(user_id=user.user_id).values_list('version', flat=True)
+    return next(iter(versions), 0)
+
+
+def bump_data_version(user):
+    """
+    Увеличивает счетчик изменений пользователя одним запросом (строка создается при первом изменении).
+    Вызывается после записи данных: иначе клиент мог бы получить новый ETag вместе со старыми данными.
+    """
+    table = UserDataVersion._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO "{table}" AS v (user_id, version) VALUES (%s, 1) '
+            f'ON CONFLICT (user_id) DO UPDATE SET version = v.version + 1',
+            [user.user_id]
+        )
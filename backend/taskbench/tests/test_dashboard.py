@@ -0,0 +1,170 @@
+import csv
+import json
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User as StaffUser
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from dashboard.service import compute_metrics, encode_subscription_cursor, estimated_counts, get_subscription_page
+from dashboard.service import series_cache
+from taskbench.models.models import User, Task, Subtask, Subscription, DashboardSnapshot, DailyCompletion
+from taskbench.models.models import SchedulerHeartbeat, UserActivityDay
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.user = User.objects.create(email='new@example.com')
+        old_user = User.objects.create(email='old@example.com', created_at=now - timedelta(days=30),
+                                       access_at=now - timedelta(days=30))
+        Subscription.objects.create(user=self.user, is_active=True)
+        Subscription.objects.create(user=self.user, start_date=now - timedelta(days=40))
+        task = Task.objects.create(title='Today', user=self.user)
+        Task.objects.create(title='Old', user=old_user, created_at=now - timedelta(days=30))
+        Subtask.objects.create(text='Subtask', task=task)
+
+        StaffUser.objects.create_user(username='admin', password='admin_password', is_staff=True)
+        self.client.login(username='admin', password='admin_password')
+
+    def tearDown(self):
+        series_cache._entries.clear()
+
+    def test_metrics_in_four_queries(self):
+        with self.assertNumQueries(4):
+            data = compute_metrics()
+        self.assertEqual(data['total_users'], 2)
+        self.assertEqual(data['new_users_today'], 1)
+        self.assertEqual(data['active_users_today'], 1)
+        self.assertEqual(data['total_subscribers'], 1)
+        self.assertEqual(data['new_subs_today'], 1)
+        self.assertEqual((data['total_tasks'], data['tasks_today']), (2, 1))
+        self.assertEqual(data['total_subtasks'], 1)
+
+    def test_estimated_counts_without_analyze(self):
+        # в новой тестовой базе таблицы не анализировались, поэтому используется точный подсчет
+        self.assertEqual(estimated_counts(Task, Subtask), {Task: None, Subtask: None})
+        self.assertEqual(compute_metrics(estimate=True)['total_tasks'], 2)
+
+    def test_stats_api_reads_snapshot(self):
+        response = self.client.get(reverse('stats_api'))
+        self.assertEqual(response.json()['total_tasks'], 2)
+        self.assertEqual(DashboardSnapshot.objects.count(), 1)
+
+        Task.objects.create(title='Not in snapshot yet', user=self.user)
+        # сессия, пользователь дашборда и снимок
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('stats_api'))
+        self.assertEqual(response.json()['total_tasks'], 2)
+
+    def test_scheduler_status(self):
+        SchedulerHeartbeat.objects.create(instance='node1:1', is_leader=True)
+        SchedulerHeartbeat.objects.create(instance='node2:1', heartbeat_at=timezone.now() - timedelta(hours=1))
+        data = self.client.get(reverse('scheduler_status_api')).json()
+        self.assertEqual(data['leader'], 'node1:1')
+        self.assertEqual([row['stale'] for row in data['instances']], [False, True])
+
+    def test_time_series(self):
+        today = timezone.localdate()
+        DailyCompletion.objects.create(user=self.user, day=today, count=3)
+        UserActivityDay.objects.create(user=self.user, day=today - timedelta(days=1))
+        url = f"{reverse('time_series_api')}?start={today - timedelta(days=2)}&end={today}"
+
+        data = self.client.get(url).json()
+        self.assertEqual(len(data['days']), 3)
+        self.assertEqual(data['series']['signups'], [0, 0, 1])
+        self.assertEqual(data['series']['tasks_created'], [0, 0, 1])
+        self.assertEqual(data['series']['tasks_completed'], [0, 0, 3])
+        self.assertEqual(data['series']['active_users'], [0, 1, 0])
+        self.assertEqual(data['series']['new_subscriptions'], [0, 0, 1])
+
+        # повторный запрос того же окна берется из кэша
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).json(), data)
+
+        self.assertEqual(self.client.get(f"{url}&start=bad").status_code, 400)
+
+    def test_subscription_list_keyset_pages(self):
+        start = timezone.now() - timedelta(days=100)
+        for i in range(23):
+            Subscription.objects.create(user=self.user, start_date=start + timedelta(days=i // 2), is_active=i % 3 == 0)
+        url = reverse('subscription_list_api')
+
+        ids, cursor = [], None
+        while True:
+            data = self.client.get(url + (f"?cursor={cursor}" if cursor else "")).json()
+            ids += [sub['id'] for sub in data['subscriptions']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        expected = list(Subscription.objects.order_by('-start_date', '-subscription_id')
+                        .values_list('subscription_id', flat=True))
+        self.assertEqual(ids, expected)
+
+        data = self.client.get(f"{url}?is_active=true&email=NEW").json()
+        self.assertEqual(len(data['subscriptions']), 9)
+        self.assertEqual(data['approx_total'], 9)
+        self.assertEqual(self.client.get(f"{url}?email=old").json()['subscriptions'], [])
+
+        day = (start + timedelta(days=3)).date().isoformat()
+        data = self.client.get(f"{url}?start_from={day}&start_to={day}").json()
+        self.assertEqual(len(data['subscriptions']), 2)
+
+        self.assertEqual(self.client.get(f"{url}?cursor=invalid").status_code, 400)
+
+
+class SubscriptionPageTests(TestCase):
+    def test_deep_page_seeks_in_index(self):
+        user = User.objects.create(email='pages@example.com')
+        start = timezone.now() - timedelta(days=1000)
+        Subscription.objects.bulk_create([
+            Subscription(user=user, start_date=start + timedelta(days=i // 3), is_active=i % 2 == 0)
+            for i in range(3000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Subscription._meta.db_table}")
+
+        for subscriptions in [Subscription.objects.all(), Subscription.objects.filter(is_active=True)]:
+            expected = list(subscriptions.order_by('-start_date', '-subscription_id'))
+            with CaptureQueriesContext(connection) as queries:
+                page, _ = get_subscription_page(subscriptions, encode_subscription_cursor(expected[1000]))
+            self.assertEqual(page, expected[1001:1011])
+
+            # Курсор - условие индекса, а не фильтр: отбрасываются только строки рядом со страницей
+            # (is_active, если планировщик выбрал индекс без него), а не все 1000 предыдущих
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN ANALYZE {queries[-1]['sql']}")
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            self.assertRegex(plan, r'Index Cond: .*ROW\(')
+            removed = [int(rows) for rows in re.findall(r'Rows Removed by Filter: (\d+)', plan)]
+            self.assertLess(sum(removed), 100, plan)
+
+
+class DashboardExportTests(TransactionTestCase):
+    # Выгрузка читает через серверный курсор вне транзакции, поэтому TestCase (все в atomic) не подходит
+
+    def setUp(self):
+        self.user = User.objects.create(email='user@example.com')
+        for i in range(5):
+            Subscription.objects.create(user=self.user, is_active=i % 2 == 0, latest_yookassa_payment_id=f'pay-{i}')
+        StaffUser.objects.create_user(username='admin', password='admin_password', is_staff=True)
+        self.client.login(username='admin', password='admin_password')
+
+    def test_export_subscriptions_csv(self):
+        response = self.client.get(reverse('export_subscriptions_api') + '?is_active=true')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:2], ['subscription_id', 'email'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][1], 'user@example.com')
+
+    def test_export_users_ndjson(self):
+        response = self.client.get(reverse('export_users_api') + '?format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['email'] for line in lines], ['user@example.com'])
+
+        self.assertEqual(self.client.get(reverse('export_users_api') + '?format=xml').status_code, 400)
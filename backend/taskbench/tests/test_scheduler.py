@@ -0,0 +1,70 @@
+from unittest.mock import Mock, patch
+
+from django.db import connection
+from django.test import TestCase
+
+from taskbench.management.commands.run_scheduler import Command
+from taskbench.scheduler import create_scheduler, run_job
+from taskbench.utils.leader_lock import LeaderLock
+
+LOCK_KEY = 424242
+
+
+class SchedulerJobsTests(TestCase):
+    def test_jobs_close_old_connections(self):
+        jobs = create_scheduler().get_jobs()
+        self.assertTrue(jobs)
+        self.assertTrue(all(job.func is run_job for job in jobs))
+
+        calls = []
+        with patch('django.db.close_old_connections', side_effect=lambda: calls.append('close')):
+            run_job(lambda: calls.append('job'))
+        self.assertEqual(calls, ['close', 'job', 'close'])
+
+
+class LeaderElectionTests(TestCase):
+    def setUp(self):
+        self.locks = [LeaderLock(LOCK_KEY), LeaderLock(LOCK_KEY)]
+
+    def tearDown(self):
+        for lock in self.locks:
+            lock.release()
+
+    @staticmethod
+    def command(instance):
+        command = Command()
+        command.instance = instance
+        command.scheduler = None
+        command.leader_since = None
+        return command
+
+    def test_leader_lock(self):
+        first, second = self.locks
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+
+    def test_standby_takes_over_and_old_leader_steps_down(self):
+        leader, standby = self.command('node1:1'), self.command('node2:1')
+        with patch.object(Command, 'start_scheduler', side_effect=lambda: Mock()):
+            leader.elect(self.locks[0])
+            standby.elect(self.locks[1])
+            self.assertIsNotNone(leader.scheduler)
+            self.assertIsNone(standby.scheduler)
+            old_scheduler = leader.scheduler
+
+            # Сессия лидера оборвалась: PostgreSQL снимает блокировку, резервный процесс ее получает
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_terminate_backend(%s, 5000)", [self.locks[0]._conn.get_backend_pid()])
+            standby.elect(self.locks[1])
+            self.assertIsNotNone(standby.scheduler)
+            self.assertIsNotNone(standby.leader_since)
+
+            # Прежний лидер замечает потерю блокировки, останавливает планировщик и остается в резерве
+            leader.elect(self.locks[0])
+            old_scheduler.shutdown.assert_called_once_with(wait=False)
+            self.assertIsNone(leader.scheduler)
+            self.assertIsNone(leader.leader_since)
+            leader.elect(self.locks[0])
+            self.assertIsNone(leader.scheduler)
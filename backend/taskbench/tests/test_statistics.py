@@ -1,8 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
-from taskbench.models.models import User, Task
+from taskbench.models.models import User, Task, DailyCompletion, CompletionStreak
+from taskbench.services.statistics_service import completed_tasks_by_day, daily_completions, record_completion, get_streak
 from django.utils import timezone
 from datetime import timedelta, datetime
 
@@ -40,6 +44,73 @@ class StatisticsAPITests(TestCase):
         for value in data['weekly']:
             self.assertEqual(value, 0.0)
 
+    def test_statistics_from_completed_tasks(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.get_jwt()}'}
+        for i in range(3):
+            task = Task.objects.create(user=self.user, title=f"Task {i}")
+            if i < 2:
+                self.client.delete(reverse('task_detail', args=[task.task_id]), **headers)
+
+        today = timezone.now().date()
+        self.assertEqual(DailyCompletion.objects.get(user=self.user, day=today).count, 2)
+        data = self.client.get(reverse('statistics'), **headers).json()
+        self.assertEqual(data['done_today'], 2)
+        self.assertEqual(data['max_done'], 2)
+        self.assertAlmostEqual(data['weekly'][today.weekday()], 1.0)
+
+    def test_backfill_matches_tasks(self):
+        now = timezone.now()
+        for days_ago in [0, 0, 1, 3, 3, 3, 10]:
+            Task.objects.create(user=self.user, title="Old task", is_completed=True,
+                                completed_at=now - timedelta(days=days_ago))
+        Task.objects.create(user=self.user, title="Open task")
+
+        call_command('backfill_daily_completions', stdout=StringIO())
+        call_command('backfill_daily_completions', stdout=StringIO())
+
+        first_day, last_day = (now - timedelta(days=30)).date(), now.date()
+        expected = {
+            item['completed_at__date']: item['count']
+            for item in completed_tasks_by_day(self.user, first_day, last_day)
+        }
+        self.assertEqual(daily_completions(self.user, first_day, last_day), expected)
+
+        # серия: сегодня, 1 день назад (подряд), 3 дня назад
+        self.assertEqual(CompletionStreak.objects.get(user=self.user).current, 2)
+        self.assertEqual(CompletionStreak.objects.get(user=self.user).longest, 2)
+
+    def test_streak_is_tracked_incrementally(self):
+        now = timezone.now()
+        for days_ago in [5, 4, 4, 3, 1, 0]:
+            record_completion(self.user, now - timedelta(days=days_ago))
+        streak = get_streak(self.user)
+        self.assertEqual((streak['current'], streak['longest']), (2, 3))
+
+        record_completion(self.user, now + timedelta(days=3))
+        self.assertEqual(get_streak(self.user)['longest'], 3)
+        self.assertEqual(CompletionStreak.objects.get(user=self.user).current, 1)
+
+    def test_statistics_range(self):
+        for day, count in [('2025-01-30', 2), ('2025-02-03', 1), ('2025-02-04', 4), ('2025-03-15', 5)]:
+            DailyCompletion.objects.create(user=self.user, day=day, count=count)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.get_jwt()}'}
+        url = reverse('statistics_range')
+
+        data = self.client.get(f"{url}?start=2025-01-01&end=2025-03-31&granularity=month", **headers).json()
+        self.assertEqual([(b['start'], b['count']) for b in data['buckets']],
+                         [('2025-01-01', 2), ('2025-02-01', 5), ('2025-03-01', 5)])
+        self.assertEqual((data['total'], data['max']), (12, 5))
+
+        data = self.client.get(f"{url}?start=2025-02-01&end=2025-02-10&granularity=week", **headers).json()
+        self.assertEqual([(b['start'], b['count']) for b in data['buckets']],
+                         [('2025-01-27', 0), ('2025-02-03', 5), ('2025-02-10', 0)])
+
+        data = self.client.get(f"{url}?start=2025-02-02&end=2025-02-05", **headers).json()
+        self.assertEqual([b['count'] for b in data['buckets']], [0, 1, 4, 0])
+
+        response = self.client.get(f"{url}?start=2025-02-05&end=2025-02-01", **headers)
+        self.assertEqual(response.status_code, 400)
+
 
 """
     Оно работает нормально, поверьте мне. Просто тест написан плохо, 
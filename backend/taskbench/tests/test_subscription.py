@@ -1,9 +1,23 @@
-from django.test import TestCase, Client
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, Client
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from yookassa import Configuration
+
+from backend.settings import YOOKASSA_HTTP_TIMEOUT
+from subscription.cache import entitlement_cache, get_entitlement
+from subscription.client import Payment
+from subscription.tasks import charge_recurring_subscriptions, expire_subscriptions, process_webhook_events
+from subscription.tasks import renewal_idempotency_key
 
-from taskbench.models.models import User, Subscription
+from taskbench.models.models import User, Subscription, RecurringChargeRun, WebhookEvent
 
 
 class SubscriptionAPITests(TestCase):
@@ -166,3 +180,213 @@ class SubscriptionAPITests(TestCase):
             format='json')
         is_active = bool(response.json().get('is_active'))
         self.assertTrue(is_active)
+
+    def test_status_is_cached_until_subscription_changes(self):
+        access = str(RefreshToken.for_user(self.user3).access_token)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+        url = reverse('subscription_status')
+        self.client.get(url, **headers)  # кладет токен в кэш
+        entitlement_cache.invalidate_user(self.user3.user_id)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(self.client.get(url, **headers).json()['is_active'])
+        with self.assertNumQueries(0):
+            self.assertTrue(self.client.get(url, **headers).json()['is_subscribed'])
+
+        self.subscription3.deactivate()
+        response = self.client.get(url, **headers).json()
+        self.assertFalse(response['is_active'])
+        self.assertTrue(response['is_subscribed'])
+
+
+class RecurringChargeTests(TestCase):
+    def setUp(self):
+        ended = timezone.now() - timedelta(days=1)
+        self.subscriptions = [
+            Subscription.objects.create(
+                user=User.objects.create(email=f'recurring{i}@example.com'), is_active=True,
+                end_date=ended, yookassa_payment_method_id=f'pm-{i}'
+            )
+            for i in range(5)
+        ]
+
+    def test_batches_checkpoint_and_resume(self):
+        calls = []
+
+        def create(subscription, description, payment_method_id, idempotency_key=None):
+            calls.append((subscription.subscription_id, idempotency_key))
+            if payment_method_id == 'pm-1':
+                raise ValueError("declined")
+
+        with patch('subscription.tasks.RECURRING_CHARGE_BATCH_SIZE', 2), \
+                patch('subscription.tasks.create_payment_without_confirmation', side_effect=create):
+            charge_recurring_subscriptions()
+
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(len({key for _, key in calls}), 5)
+        run = RecurringChargeRun.objects.get()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual((run.charged, run.failed), (4, 1))
+        self.assertEqual(run.last_subscription_id, self.subscriptions[-1].subscription_id)
+        self.subscriptions[1].refresh_from_db()
+        self.assertFalse(self.subscriptions[1].is_active)
+
+        # Незавершенный запуск продолжается с сохраненной позиции, ключ идемпотентности тот же
+        run.finished_at = None
+        run.last_subscription_id = self.subscriptions[2].subscription_id
+        run.save()
+        calls.clear()
+        with patch('subscription.tasks.create_payment_without_confirmation', side_effect=create):
+            charge_recurring_subscriptions()
+        self.assertEqual([sub_id for sub_id, _ in calls],
+                         [sub.subscription_id for sub in self.subscriptions[3:]])
+        self.assertEqual(calls[0][1], renewal_idempotency_key(self.subscriptions[3]))
+        self.assertEqual(RecurringChargeRun.objects.count(), 1)
+
+
+    def test_subscriptions_ending_later_today_are_charged(self):
+        end_of_today = timezone.localtime().replace(hour=23, minute=59, second=0, microsecond=0)
+        later_today, tomorrow = [
+            Subscription.objects.create(user=User.objects.create(email=f'today{i}@example.com'), is_active=True,
+                                        end_date=end_date, yookassa_payment_method_id=f'pm-today-{i}')
+            for i, end_date in enumerate([end_of_today, end_of_today + timedelta(minutes=2)])
+        ]
+        with patch('subscription.tasks.create_payment_without_confirmation') as create:
+            charge_recurring_subscriptions()
+        charged = {call.args[0].subscription_id for call in create.call_args_list}
+        self.assertIn(later_today.subscription_id, charged)
+        self.assertNotIn(tomorrow.subscription_id, charged)
+        self.assertEqual(len(charged), len(self.subscriptions) + 1)
+
+
+class RecurringChargeLockTests(TransactionTestCase):
+    def test_run_processed_by_another_scheduler_is_skipped(self):
+        Subscription.objects.create(
+            user=User.objects.create(email='locked@example.com'), is_active=True,
+            end_date=timezone.now() - timedelta(days=1), yookassa_payment_method_id='pm-1'
+        )
+        run = RecurringChargeRun.objects.create(run_date=timezone.localdate())
+        locked, release = threading.Event(), threading.Event()
+
+        def other_scheduler():
+            # Прежний лидер еще обрабатывает пачку этого запуска
+            with transaction.atomic():
+                RecurringChargeRun.objects.select_for_update().get(pk=run.pk)
+                locked.set()
+                release.wait(5)
+            connection.close()
+
+        thread = threading.Thread(target=other_scheduler)
+        thread.start()
+        locked.wait(5)
+        try:
+            with patch('subscription.tasks.create_payment_without_confirmation') as create:
+                charge_recurring_subscriptions()
+        finally:
+            release.set()
+            thread.join()
+
+        create.assert_not_called()
+        run.refresh_from_db()
+        self.assertIsNone(run.finished_at)
+        self.assertEqual((run.last_subscription_id, run.charged, run.failed), (0, 0, 0))
+
+
+class SubscriptionExpiryTests(TestCase):
+    def test_expire_subscriptions(self):
+        now = timezone.now()
+        users = [User.objects.create(email=f'expiry{i}@example.com') for i in range(3)]
+        lapsed = Subscription.objects.create(user=users[0], is_active=True, end_date=now - timedelta(days=3))
+        # закончилась вчера: автосписание еще может ее продлить
+        grace = Subscription.objects.create(user=users[1], is_active=True, end_date=now - timedelta(days=1))
+        current = Subscription.objects.create(user=users[2], is_active=True, end_date=now + timedelta(days=5))
+        for user in users:
+            get_entitlement(user)
+
+        with self.assertNumQueries(4):  # UPDATE ... RETURNING и NOTIFY, в тесте еще SAVEPOINT и RELEASE
+            expired = expire_subscriptions()
+        self.assertEqual([row[:2] for row in expired], [(lapsed.subscription_id, users[0].user_id)])
+        self.assertEqual(
+            dict(Subscription.objects.values_list('subscription_id', 'is_active')),
+            {lapsed.subscription_id: False, grace.subscription_id: True, current.subscription_id: True}
+        )
+        self.assertFalse(entitlement_cache.get(users[0].user_id)[0])
+        self.assertTrue(entitlement_cache.get(users[2].user_id)[0])
+        self.assertEqual(expire_subscriptions(), [])
+
+
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        self.subscription = Subscription.objects.create(user=User.objects.create(email='webhook@example.com'))
+
+    def notification(self, event='payment.succeeded', payment_id='pay-1'):
+        return {'type': 'notification', 'event': event, 'object': {'id': payment_id}}
+
+    def test_webhook_is_queued_once(self):
+        with patch('subscription.tasks.handle_message_from_yookassa') as handle:
+            for _ in range(2):
+                response = self.client.post(reverse('yookassa_webhook'), self.notification(),
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+            handle.assert_not_called()
+        self.client.post(reverse('yookassa_webhook'), self.notification(event='payment.canceled'),
+                         content_type='application/json')
+        self.client.post(reverse('yookassa_webhook'), 'not json', content_type='application/json')
+        self.assertEqual(WebhookEvent.objects.count(), 2)
+
+    def test_process_webhook_events(self):
+        WebhookEvent.objects.create(payment_id='pay-1', event='payment.succeeded', payload=self.notification())
+        WebhookEvent.objects.create(payment_id='pay-2', event='payment.succeeded',
+                                    payload=self.notification(payment_id='pay-2'))
+
+        def handle(data):
+            if data['object']['id'] == 'pay-2':
+                raise ValueError("YooKassa is unavailable")
+
+        with patch('subscription.tasks.handle_message_from_yookassa', side_effect=handle) as handler:
+            self.assertEqual(process_webhook_events(), 1)
+            self.assertEqual(handler.call_count, 2)
+        done, failed = WebhookEvent.objects.order_by('webhook_event_id')
+        self.assertIsNotNone(done.processed_at)
+        self.assertEqual((failed.processed_at, failed.attempts, failed.last_error),
+                         (None, 1, "YooKassa is unavailable"))
+
+        # Повтор только для необработанного события
+        with patch('subscription.tasks.handle_message_from_yookassa') as handler:
+            self.assertEqual(process_webhook_events(), 1)
+            handler.assert_called_once_with(data=failed.payload)
+
+
+class WebhookCommitTests(TransactionTestCase):
+    def test_each_event_is_committed_separately(self):
+        for payment_id in ('pay-1', 'pay-2', 'pay-3'):
+            WebhookEvent.objects.create(payment_id=payment_id, event='payment.succeeded',
+                                        payload={'event': 'payment.succeeded', 'object': {'id': payment_id}})
+        committed = {}
+
+        def read_committed():
+            # Отдельный поток - отдельное соединение, он видит только зафиксированные данные
+            committed.update(WebhookEvent.objects.filter(processed_at__isnull=False).values_list('payment_id', 'attempts'))
+            connection.close()
+
+        def handle(data):
+            if data['object']['id'] == 'pay-2':
+                thread = threading.Thread(target=read_committed)
+                thread.start()
+                thread.join()
+                raise ValueError("YooKassa timed out")
+
+        with patch('subscription.tasks.handle_message_from_yookassa', side_effect=handle):
+            self.assertEqual(process_webhook_events(), 2)
+        self.assertEqual(committed, {'pay-1': 1})
+        self.assertEqual(
+            dict(WebhookEvent.objects.filter(processed_at__isnull=True).values_list('payment_id', 'last_error')),
+            {'pay-2': "YooKassa timed out"}
+        )
+
+    def test_yookassa_requests_have_timeout(self):
+        with patch('requests.adapters.HTTPAdapter.send', side_effect=ConnectionError("offline")) as send, \
+                patch.object(Configuration, 'account_id', 'store'), patch.object(Configuration, 'secret_key', 'key'):
+            with self.assertRaises(Exception):
+                Payment.find_one('pay-1')
+        self.assertEqual(send.call_args.kwargs['timeout'], YOOKASSA_HTTP_TIMEOUT)
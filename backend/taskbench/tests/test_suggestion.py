@@ -1,4 +1,9 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
 
 from django.test import SimpleTestCase, TestCase
 from django.urls import reverse
@@ -6,8 +11,11 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from suggestion.service import SuggestionService
-from taskbench.models.models import User, Category, Subscription
+from suggestion.cache import SuggestionCache, make_key, normalize_text, purge_suggestion_cache, suggestion_cache
+from backend import settings
+from suggestion.metrics import SuggestionMode
+from suggestion.service import SuggestionService, get_suggestion_mode, run_components
+from taskbench.models.models import User, Category, Subscription, SuggestionCacheEntry
 
 
 class SuggestionServiceTestCase(SimpleTestCase):
@@ -46,6 +54,205 @@ class SuggestionServiceTestCase(SimpleTestCase):
         self.assertTrue(0 <= result <= 1)
 
 
+class SuggestionCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache = SuggestionCache(max_size=2, ttl=60, db_ttl=3600)
+
+    def test_normalized_text_shares_entry(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return ['wash']
+
+        for title in ['Помыть машину', '  помыть   МАШИНУ!', 'помыть машину.']:
+            self.assertEqual(self.cache.cached('subtasks', 'v1', [normalize_text(title)], compute), ['wash'])
+        self.assertEqual(len(calls), 1)
+        # другая версия промпта - другой ключ
+        self.cache.cached('subtasks', 'v2', [normalize_text('Помыть машину')], compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_database_tier_and_eviction(self):
+        for i in range(3):
+            self.cache.cached('subtasks', 'v1', [f'задача {i}'], lambda: [str(i)])
+        self.assertEqual(self.cache.stats()['size'], 2)
+        self.assertEqual(SuggestionCacheEntry.objects.count(), 3)
+
+        # вытесненная из памяти запись читается из таблицы, None - тоже закэшированный ответ
+        self.assertEqual(self.cache.get(make_key('subtasks', 'v1', 'задача 0')), (True, ['0']))
+        self.cache.put(make_key('deadline', 'v1', 'купить продукты'), 'deadline', None, 1.5)
+        self.cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get(make_key('deadline', 'v1', 'купить продукты')), (True, None))
+        stats = self.cache.stats()
+        self.assertEqual((stats['db_hits'], stats['misses']), (2, 3))
+        self.assertGreaterEqual(stats['saved_seconds'], 1.5)
+
+        SuggestionCacheEntry.objects.update(expires_at=datetime.now(timezone.utc))
+        self.assertEqual(purge_suggestion_cache(), 4)
+
+
+class SuggestionFanOutTestCase(SimpleTestCase):
+    def test_components_run_concurrently(self):
+        # Барьер проходят только три компонента, запущенные одновременно: при последовательном запуске
+        # он сломается по таймауту и все результаты будут запасными
+        barrier = threading.Barrier(3, timeout=5)
+
+        def component(value):
+            barrier.wait()
+            return value
+
+        results = run_components({
+            'deadline': (lambda: component('deadline'), lambda: None),
+            'category': (lambda: component(1), lambda: -1),
+            'subtasks': (lambda: component(['a']), lambda: []),
+        })
+        self.assertEqual(results, {'deadline': 'deadline', 'category': 1, 'subtasks': ['a']})
+
+    def test_slow_or_failed_component_falls_back(self):
+        release = threading.Event()
+
+        def hang():
+            release.wait(5)
+            return 'late'
+
+        def fail():
+            raise RuntimeError("GigaChat is unavailable")
+
+        try:
+            with patch.object(settings, 'SUGGESTION_COMPONENT_TIMEOUT', 0.2):
+                results = run_components({
+                    'deadline': (hang, lambda: 'local'),
+                    'category': (fail, lambda: -1),
+                    'subtasks': (lambda: ['a'], lambda: []),
+                })
+        finally:
+            release.set()
+        self.assertEqual(results, {'deadline': 'local', 'category': -1, 'subtasks': ['a']})
+
+
+    def test_queued_component_is_cancelled(self):
+        release, ran = threading.Event(), []
+        pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            with patch('suggestion.service._executor', pool), \
+                    patch.object(settings, 'SUGGESTION_COMPONENT_TIMEOUT', 0.2), \
+                    patch.object(settings, 'SUGGESTION_TIMEOUT', 0.5):
+                results = run_components({
+                    'deadline': (lambda: release.wait(5), lambda: 'local'),
+                    'category': (lambda: ran.append('category'), lambda: -1),
+                })
+        finally:
+            release.set()
+            pool.shutdown(wait=True)
+        self.assertEqual(results, {'deadline': 'local', 'category': -1})
+        # Отмененный компонент так и не выполнился, хотя поток пула освободился
+        self.assertEqual(ran, [])
+
+    def test_component_timeout_counts_from_its_start(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            with patch('suggestion.service._executor', pool), \
+                    patch.object(settings, 'SUGGESTION_COMPONENT_TIMEOUT', 0.3), \
+                    patch.object(settings, 'SUGGESTION_TIMEOUT', 5):
+                results = run_components({
+                    'deadline': (lambda: time.sleep(0.4), lambda: 'local'),
+                    # ждет в очереди дольше SUGGESTION_COMPONENT_TIMEOUT, но сам выполняется сразу
+                    'category': (lambda: 1, lambda: -1),
+                })
+        finally:
+            pool.shutdown(wait=True)
+        self.assertEqual(results, {'deadline': 'local', 'category': 1})
+
+
+class CombinedSuggestionTestCase(TestCase):
+    def setUp(self):
+        self.service = SuggestionService()
+        self.now = datetime(2025, 4, 24, 12, 0)
+        suggestion_cache.clear()
+
+    def combined(self, content, categories=('family', 'study')):
+        reply = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        with patch.object(self.service, 'debug', False), \
+                patch.object(self.service, 'send_message_with_system_prompt', return_value=reply) as send:
+            result = self.service.suggest_combined('Exam tomorrow at 3 pm', list(categories), now=self.now)
+        send.assert_called_once()
+        return result
+
+    def test_valid_json(self):
+        result = self.combined('```json\n{"deadline": "2025:04:25 15:00", "category": 1, '
+                               '"subtasks": ["1. Read notes", "Sleep"]}\n```')
+        self.assertEqual(result, {'deadline': datetime(2025, 4, 25, 15, 0), 'category': 1,
+                                  'subtasks': ['read notes', 'sleep']})
+
+    def test_invalid_fields_fall_back(self):
+        result = self.combined('{"deadline": 42, "category": "Study", "subtasks": "- Read notes\\n- Sleep"}')
+        # срок - локальный разбор текста задачи
+        local = self.service.suggest_deadline_local('Exam tomorrow at 3 pm', now=self.now)
+        self.assertEqual(result, {'deadline': local, 'category': 1, 'subtasks': ['read notes', 'sleep']})
+
+        result = self.combined('not json', categories=('work',))
+        self.assertEqual(result, {'deadline': local, 'category': -1, 'subtasks': []})
+
+    def test_numeric_string_category_is_index(self):
+        result = self.combined('{"deadline": "2025:04:25 15:00", "category": " 1 ", "subtasks": []}')
+        self.assertEqual(result['category'], 1)
+        result = self.combined('{"deadline": "2025:04:25 15:00", "category": "1", "subtasks": []}', categories=('work',))
+        self.assertEqual(result['category'], -1)
+
+    def test_suggestion_mode(self):
+        even, odd = SimpleNamespace(user_id=2), SimpleNamespace(user_id=3)
+        with patch.object(settings, 'SUGGESTION_MODE', SuggestionMode.AB):
+            self.assertEqual(get_suggestion_mode(even), SuggestionMode.SEPARATE)
+            self.assertEqual(get_suggestion_mode(odd), SuggestionMode.COMBINED)
+        with patch.object(settings, 'SUGGESTION_MODE', 'Combined'):
+            self.assertEqual(get_suggestion_mode(odd), SuggestionMode.SEPARATE)
+
+
+class GigaChatTokenTestCase(SimpleTestCase):
+    def test_token_refreshed_in_background_once(self):
+        calls = []
+        refreshing, release = threading.Event(), threading.Event()
+
+        class FakeGigaChat:
+            def __init__(self, **kwargs):
+                self.expires_in = 30  # меньше GIGACHAT_API_SAFETY_GAP: сразу нужно обновление
+
+            def get_token(self):
+                calls.append(threading.current_thread().name)
+                if len(calls) > 1:
+                    # Обновление в фоне зависло, пока тест его не отпустит
+                    refreshing.set()
+                    release.wait(5)
+                expires_at = time.time() + self.expires_in
+                self.expires_in = 3600
+                return SimpleNamespace(access_token=f'token-{len(calls)}', expires_at=expires_at * 1000)
+
+        with patch('suggestion.service.GigaChat', FakeGigaChat):
+            service = SuggestionService.__wrapped__(debug=False)
+
+        try:
+            service.update_token()
+            self.assertTrue(refreshing.wait(5))
+
+            # Запросы не ждут получения токена: все потоки завершаются, пока get_token заблокирован
+            threads = [threading.Thread(target=service.update_token) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            self.assertFalse(any(thread.is_alive() for thread in threads))
+            self.assertEqual(service.access_token, 'token-1')
+        finally:
+            release.set()
+
+        deadline = time.monotonic() + 5
+        while service.access_token != 'token-2' and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(service.access_token, 'token-2')
+        self.assertEqual(calls[1:], ['gigachat-token-refresher'])
+
+
 class SuggestionApiTestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
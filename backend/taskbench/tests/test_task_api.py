@@ -1,8 +1,13 @@
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework_simplejwt.tokens import RefreshToken
 from taskbench.models.models import User, Task, Subtask, Category, TaskCategory  # Абсолютный импорт
+from taskbench.serializers.task_serializers import Sort
+from taskbench.services.task_service import after_cursor
 import json
+import re
 from datetime import datetime, timedelta
 from django.utils.timezone import make_aware
 
@@ -145,6 +150,37 @@ class TaskAPITests(TestCase):
         self.assertEqual(Task.objects.count(), 3)
         self.assertEqual(Subtask.objects.count(), 3)
 
+    def test_create_task_batch(self):
+        url = reverse('task_batch')
+
+        def batch(size):
+            return {"tasks": [{
+                "content": f"Batch task {i}",
+                "dpc": {"priority": i, "category_id": self.category.category_id},
+                "subtasks": [{"content": "Subtask A"}, {"content": "Subtask B"}]
+            } for i in range(size)]}
+
+        self.client.get(reverse('task_list'), **self.get_auth_headers())
+        counts = []
+        for size in [2, 20]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data=json.dumps(batch(size)), **self.get_auth_headers())
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.json()), size)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Task.objects.filter(title__startswith='Batch task').count(), 22)
+        self.assertEqual(Subtask.objects.filter(task__title__startswith='Batch task').count(), 44)
+        self.assertEqual(response.json()[0]['dpc']['category_name'], 'Work')
+        self.assertEqual([s['content'] for s in response.json()[0]['subtasks']], ['Subtask A', 'Subtask B'])
+
+    def test_create_task_batch_is_atomic(self):
+        data = [{"content": "Valid task"}, {"content": "Wrong category", "dpc": {"category_id": 999}}]
+        response = self.client.post(reverse('task_batch'), data=json.dumps(data), **self.get_auth_headers())
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Task.objects.filter(title='Valid task').exists())
+
     def test_invalid_date_filter(self):
         url = f"{reverse('task_list')}?date=invalid-date"
         response = self.client.get(url, **self.get_auth_headers())
@@ -329,6 +365,145 @@ class TaskAPITests(TestCase):
         self.assertEqual(len(tasks), 1)
         self.assertEqual(tasks[0]['id'], task_in_range.task_id)
 
+    def test_cursor_pagination(self):
+        deadline = make_aware(datetime(2024, 5, 20, 14, 0))
+        for i in range(7):
+            Task.objects.create(
+                title=f'Paged task {i}',
+                deadline=None if i % 3 == 0 else deadline + timedelta(hours=i % 2),
+                priority=i % 2,
+                user=self.user
+            )
+
+        for sort_by in ['priority', 'deadline']:
+            url = f"{reverse('task_list')}?sort_by={sort_by}"
+            expected = [t['id'] for t in self.client.get(f"{url}&limit=100", **self.get_auth_headers()).json()]
+
+            ids = []
+            cursor = None
+            while True:
+                page_url = f"{url}&limit=2" + (f"&cursor={cursor}" if cursor else "")
+                response = self.client.get(page_url, **self.get_auth_headers())
+                self.assertEqual(response.status_code, 200)
+                ids += [t['id'] for t in response.json()]
+                cursor = response.headers.get('X-Next-Cursor')
+                if cursor is None:
+                    break
+
+            self.assertEqual(len(expected), 9)
+            self.assertEqual(ids, expected)
+
+    def test_deep_cursor_page_seeks_in_index(self):
+        deadline = make_aware(datetime(2024, 5, 20, 14, 0))
+        Task.objects.bulk_create([
+            Task(title=f'Deep task {i}', user=self.user, priority=i % 2,
+                 deadline=None if i % 5 == 0 else deadline + timedelta(hours=i % 50))
+            for i in range(3000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Task._meta.db_table}")
+
+        open_tasks = Task.objects.filter(user=self.user, is_completed=False)
+        for sort_by, order in [(Sort.PRIORITY, ('-priority', 'deadline', 'task_id')),
+                               (Sort.DEADLINE, ('deadline', '-priority', 'task_id'))]:
+            tasks = open_tasks.order_by(*order)
+            expected = list(tasks)
+            last = expected[2000]
+            page = after_cursor(tasks, sort_by, {'priority': last.priority, 'deadline': last.deadline,
+                                                 'task_id': last.task_id}, 11)
+            self.assertEqual(list(page[:11]), expected[2001:2012])
+
+            # Курсор - условие индекса, а не фильтр: каждая ветка читает не больше 11 строк, как первая страница
+            plan = page[:11].explain(analyze=True)
+            self.assertNotIn('Rows Removed by Filter', plan)
+            self.assertNotIn('Seq Scan', plan)
+            scanned = re.findall(r'Index Scan using task_open_\w+_idx .*actual .*rows=(\d+)', plan)
+            self.assertTrue(scanned)
+            self.assertTrue(all(int(rows) <= 11 for rows in scanned), plan)
+
+    def test_task_list_query_count_does_not_depend_on_page_size(self):
+        for i in range(10):
+            task = Task.objects.create(title=f'Task {i + 3}', priority=0, user=self.user)
+            TaskCategory.objects.create(task=task, category=self.category)
+            Subtask.objects.create(text=f'Subtask {i + 2}', task=task)
+
+        # первый запрос кладет токен в кэш, дальше пользователь из базы не читается
+        self.client.get(reverse('task_list'), **self.get_auth_headers())
+
+        counts = []
+        for limit in [2, 12]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f"{reverse('task_list')}?limit={limit}", **self.get_auth_headers())
+            self.assertEqual(len(response.json()), limit)
+            self.assertTrue(all(t['dpc']['category_name'] for t in response.json()[1:]))
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        # версия данных для ETag, задачи, подзадачи, связи с категориями, категории
+        self.assertLessEqual(counts[1], 5)
+
+    def test_task_response_query_count(self):
+        url = reverse('task_detail', args=[self.task1.task_id])
+        # пользователь, задача, UPDATE, счетчик изменений и три запроса prefetch
+        with self.assertNumQueries(7):
+            response = self.client.patch(url, data=json.dumps({"content": "Renamed"}), **self.get_auth_headers())
+        self.assertEqual(response.json()['dpc']['category_name'], 'Work')
+
+    def test_conditional_get(self):
+        url = reverse('task_list')
+        response = self.client.get(url, **self.get_auth_headers())
+        etag = response.headers['ETag']
+
+        # первый запрос кладет токен в кэш; на 304 остается только чтение счетчика изменений
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.get_auth_headers())
+        self.assertEqual(response.status_code, 304)
+
+        other = self.client.get(f"{url}?sort_by=deadline", HTTP_IF_NONE_MATCH=etag, **self.get_auth_headers())
+        self.assertEqual(other.status_code, 200)
+
+        subtask_url = reverse('subtask_detail', args=[self.subtask1.subtask_id])
+        self.client.patch(subtask_url, data=json.dumps({"is_done": True}), **self.get_auth_headers())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.get_auth_headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_sync(self):
+        response = self.client.get(reverse('sync'), **self.get_auth_headers())
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertTrue(data['reset'])
+        self.assertEqual({t[0] for t in data['tasks']}, {self.task1.task_id, self.task2.task_id})
+        self.assertEqual(data['categories'], [[self.category.category_id, 'Work']])
+        self.assertEqual(data['subtasks'], [[self.subtask1.subtask_id, self.task1.task_id, 'Subtask 1', False]])
+
+        # все, что было до первой синхронизации, вне окна перекрытия
+        hour_ago = make_aware(datetime.now() - timedelta(hours=1))
+        Task.objects.update(updated_at=hour_ago)
+        Subtask.objects.update(updated_at=hour_ago)
+        Category.objects.update(updated_at=hour_ago)
+
+        self.client.patch(reverse('subtask_detail', args=[self.subtask1.subtask_id]),
+                          data=json.dumps({"is_done": True}), **self.get_auth_headers())
+        self.client.delete(reverse('task_detail', args=[self.task2.task_id]), **self.get_auth_headers())
+        self.client.delete(reverse('category_detail', args=[self.category.category_id]), **self.get_auth_headers())
+
+        url = f"{reverse('sync')}?since={data['cursor']}"
+        data = json.loads(b''.join(self.client.get(url, **self.get_auth_headers()).streaming_content))
+        self.assertFalse(data['reset'])
+        self.assertEqual(data['categories'], [])
+        # у task1 удалили категорию
+        self.assertEqual([(t[0], t[4]) for t in data['tasks']], [(self.task1.task_id, 0)])
+        self.assertEqual(data['subtasks'], [[self.subtask1.subtask_id, self.task1.task_id, 'Subtask 1', True]])
+        self.assertEqual(data['deleted'], [['task', self.task2.task_id], ['category', self.category.category_id]])
+
+        response = self.client.get(f"{reverse('sync')}?since=invalid", **self.get_auth_headers())
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        url = f"{reverse('task_list')}?cursor=invalid"
+        response = self.client.get(url, **self.get_auth_headers())
+        self.assertEqual(response.status_code, 400)
+
 
 
 class CategoryAPITests(TestCase):
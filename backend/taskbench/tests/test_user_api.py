@@ -1,10 +1,16 @@
 import json
+from datetime import datetime, timedelta
+from unittest import mock
 
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from taskbench.models.models import User
+from taskbench.models.models import User, UserActivityDay
+from taskbench.services.access_service import AccessTracker
+from taskbench.services.auth_cache_service import token_cache
 from rest_framework.test import APIClient
 
 
@@ -77,3 +83,72 @@ class UserApiTests(TestCase):
         url = reverse('delete_user')
         response = self.client.delete(url, HTTP_AUTHORIZATION=f'Bearer {access}', format='json')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_authentication_resolves_user_once(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        # пользователь из токена, счетчик изменений для ETag и сами категории
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('categories'), HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_cache_skips_user_lookup(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+        self.client.get(reverse('categories'), **headers)
+
+        hits = token_cache.stats()['hits']
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('categories'), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+        response = self.client.patch(
+            reverse('change_password'),
+            data={"old_password": "test_password", "new_password": "new_password"},
+            format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNone(token_cache.get(access))
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.get(reverse('categories'), HTTP_AUTHORIZATION='Bearer invalid_token')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('error', response.json())
+
+
+class AccessTrackingTests(TestCase):
+    def setUp(self):
+        self.now = timezone.make_aware(datetime(2025, 5, 20, 12, 0))
+        self.tracker = AccessTracker(flush_interval=3600, granularity=300)
+
+        self.user = User.objects.create(email='access@mail.com')
+        self.user.set_password('test_password')
+        self.user.save()
+
+    def tearDown(self):
+        if self.tracker._timer is not None:
+            self.tracker._timer.cancel()
+
+    def touch(self, access_at):
+        User.objects.filter(user_id=self.user.user_id).update(access_at=access_at)
+        self.user.refresh_from_db()
+        with mock.patch('taskbench.services.access_service.timezone.now', return_value=self.now):
+            self.tracker.touch(self.user)
+        self.user.refresh_from_db()
+        return self.user.access_at
+
+    def test_first_access_of_day_is_written_immediately(self):
+        self.assertEqual(self.touch(self.now - timedelta(days=1)), self.now)
+        self.assertEqual(self.tracker.flush(), 0)
+        self.assertTrue(UserActivityDay.objects.filter(user=self.user, day=self.now.date()).exists())
+
+    def test_recent_access_is_skipped(self):
+        stored = self.now - timedelta(minutes=1)
+        self.assertEqual(self.touch(stored), stored)
+        self.assertEqual(self.tracker.flush(), 0)
+
+    def test_stale_access_is_buffered_and_flushed(self):
+        stored = self.now - timedelta(hours=1)
+        self.assertEqual(self.touch(stored), stored)
+        self.assertEqual(self.tracker.flush(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.access_at, self.now)
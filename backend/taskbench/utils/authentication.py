@@ -0,0 +1,25 @@
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from taskbench.services.user_service import get_token, authenticate_token
+from taskbench.utils.exceptions import AuthenticationError
+
+
+class JwtAuthentication(BaseAuthentication):
+    """
+    Аутентификация по заголовку 'Authorization: Bearer <access>'.
+    Пользователь определяется один раз на запрос и доступен во view как request.user.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        token = get_token(request)['token']
+        if not token:
+            return None
+        try:
+            return authenticate_token(token), token
+        except AuthenticationError as e:
+            raise AuthenticationFailed(str(e))
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -1,9 +1,63 @@
+import hashlib
+import threading
+from functools import wraps
+
+from django.http import HttpResponseNotModified
+from django.utils import timezone
+
+from taskbench.services.version_service import get_data_version
+
+
 def singleton(cls):
+    """
+    Один экземпляр класса на процесс. Создание под блокировкой (double-checked locking),
+    поэтому при одновременных первых запросах в потоках экземпляр создается один раз.
+    Сам класс доступен как __wrapped__.
+    """
     _instance = None
+    _lock = threading.Lock()
 
+    @wraps(cls, updated=())
     def wrapper(*args, **kwargs):
         nonlocal _instance
         if _instance is None:
-            _instance = cls(*args, **kwargs)
+            with _lock:
+                if _instance is None:
+                    _instance = cls(*args, **kwargs)
         return _instance
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def conditional_on_data_version(resource: str, daily: bool = False):
+    """
+    ETag для GET-методов APIView по счетчику изменений пользователя (UserDataVersion).
+    Если ETag совпал с If-None-Match, возвращается 304 без обращения к таблицам задач и категорий.
+    Счетчик хранится в базе, поэтому ETag одинаковый во всех воркерах.
+    - resource: имя ресурса, чтобы ETag разных эндпоинтов не совпадали;
+    - daily: ответ зависит от текущей даты (статистика), дата добавляется в ETag.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            parts = [resource, str(request.user.user_id), request.META.get('QUERY_STRING', '')]
+            if daily:
+                parts.append(timezone.localdate().isoformat())
+            digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+            etag = f'W/"{get_data_version(request.user)}-{digest}"'
+
+            if _etag_matches(etag, request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+            else:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    # Слабое сравнение (RFC 9110): префикс W/ не учитывается
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return '*' in tags or etag.removeprefix('W/') in tags
@@ -1,3 +1,12 @@
+import json
+import logging
+
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, ValidationError
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
 class BaseError(Exception):
     def __init__(self, message):
         self.message = message
@@ -17,4 +26,32 @@ class AlreadyExists(BaseError):
     pass
 
 class YooKassaError(BaseError):
-    pass
\ No newline at end of file
+    pass
+
+def api_exception_handler(exc, context):
+    """
+    Общий обработчик ошибок для всех APIView: переводит исключения сервисов в ответ {'error': ...}.
+    """
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        response = Response({'error': str(exc.detail)}, status=401)
+        if getattr(exc, 'auth_header', None):
+            response['WWW-Authenticate'] = exc.auth_header
+        return response
+    if isinstance(exc, AuthenticationError):
+        return Response({'error': str(exc)}, status=401)
+    if isinstance(exc, json.JSONDecodeError):
+        return Response({'error': 'Invalid JSON'}, status=400)
+    if isinstance(exc, ValidationError):
+        return Response({'error': str(exc)}, status=400)
+    if isinstance(exc, NotFound):
+        return Response({'error': str(exc)}, status=404)
+    if isinstance(exc, AlreadyExists):
+        return Response({'error': str(exc)}, status=409)
+
+    from rest_framework.views import exception_handler  # rest_framework.views сам импортирует настройки аутентификации
+    response = exception_handler(exc, context)
+    if response is not None:
+        return response
+
+    logger.exception(f"Unhandled error in {context['view'].__class__.__name__}")
+    return Response({'error': str(exc)}, status=500)
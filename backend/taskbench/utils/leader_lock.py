@@ -0,0 +1,42 @@
+"""
+Выбор лидера через session-level advisory lock в PostgreSQL.
+Блокировка держится на отдельном соединении: пока оно живо, остальные процессы ее не получат,
+а если процесс или сеть упали, PostgreSQL снимает блокировку вместе с сессией и лидером становится резервный процесс.
+"""
+
+import psycopg2
+from django.db import connection
+
+
+class LeaderLock:
+    def __init__(self, key: int):
+        self.key = key
+        self.held = False
+        self._conn = None
+
+    def acquire(self) -> bool:
+        """Пытается стать лидером, не блокируясь. Возвращает True, если блокировка у этого процесса."""
+        if self.held:
+            return True
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**connection.get_connection_params())
+            self._conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [self.key])
+            self.held = cursor.fetchone()[0]
+        return self.held
+
+    def check(self):
+        """Проверяет, что соединение с блокировкой живо. Бросает исключение, если лидерство потеряно."""
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def release(self):
+        self.held = False
+        if self._conn is None:
+            return
+        try:
+            # Закрытие сессии снимает блокировку и без pg_advisory_unlock
+            self._conn.close()
+        finally:
+            self._conn = None
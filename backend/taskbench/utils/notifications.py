@@ -0,0 +1,105 @@
+"""
+Рассылка событий между процессами (воркерами gunicorn, нодами) через LISTEN/NOTIFY в PostgreSQL.
+Используется для сброса кэшей в памяти процессов: publish() сразу вызывает обработчики в текущем процессе
+и отправляет NOTIFY, а фоновый поток-слушатель вызывает их в остальных процессах.
+
+Слушатель запускается только после enable() (см. gunicorn.conf.py и backend/asgi.py), поэтому тесты и скрипты
+не держат лишних соединений с базой.
+Если соединение слушателя оборвалось, часть событий могла потеряться, поэтому после переподключения
+обработчики вызываются с payload=None - это значит "сбросить все".
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+_lock = threading.Lock()
+_enabled = False
+_listener_pid = None
+
+RECONNECT_DELAY = 5
+POLL_TIMEOUT = 5
+
+
+def subscribe(channel: str, handler):
+    """Регистрирует обработчик handler(payload) для канала."""
+    with _lock:
+        _handlers[channel].append(handler)
+    _ensure_listener()
+
+
+def publish(channel: str, payload: str):
+    _dispatch(channel, payload)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [channel, payload])
+
+
+def enable():
+    """Разрешает запуск слушателя в этом процессе. Вызывается при старте веб-приложения."""
+    global _enabled
+    _enabled = True
+    _ensure_listener()
+
+
+def _ensure_listener():
+    # После fork поток родителя не существует, поэтому слушатель запускается заново в каждом процессе
+    global _listener_pid
+    with _lock:
+        if not _enabled or not _handlers or _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+    threading.Thread(target=_listen_forever, name="pg-notify-listener", daemon=True).start()
+
+
+def _dispatch(channel, payload):
+    for handler in list(_handlers.get(channel, ())):
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.error(f"Notification handler for '{channel}' failed: {e}")
+
+
+def _listen_forever():
+    first = True
+    while True:
+        try:
+            _listen(reset=not first)
+        except Exception as e:
+            logger.warning(f"Notification listener disconnected: {e}")
+        first = False
+        time.sleep(RECONNECT_DELAY)
+
+
+def _listen(reset: bool):
+    conn = psycopg2.connect(**connection.get_connection_params())
+    try:
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        listening = set()
+        while True:
+            # Каналы могут появиться после запуска слушателя (модули с кэшами импортируются лениво)
+            with _lock:
+                new_channels = [channel for channel in _handlers if channel not in listening]
+            with conn.cursor() as cursor:
+                for channel in new_channels:
+                    cursor.execute(f'LISTEN "{channel}"')
+                    listening.add(channel)
+                    if reset:
+                        _dispatch(channel, None)
+
+            if select.select([conn], [], [], POLL_TIMEOUT) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                _dispatch(notify.channel, notify.payload)
+    finally:
+        conn.close()
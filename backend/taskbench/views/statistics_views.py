@@ -1,10 +1,10 @@
-from django.http import JsonResponse
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 
-from taskbench.serializers.statistics_serializers import statistics_response
-from taskbench.services.statistics_service import get_statistics
-from taskbench.services.user_service import get_token, AuthenticationError
+from taskbench.serializers.statistics_serializers import statistics_response, statistics_range_response
+from taskbench.serializers.statistics_serializers import StatisticsRangeParametersSerializer
+from taskbench.services.statistics_service import get_statistics, get_statistics_range
+from taskbench.utils.decorators import conditional_on_data_version
 
 
 class StatisticsView(APIView):
@@ -14,18 +14,28 @@ class StatisticsView(APIView):
     - done_today: количество задач, выполненных сегодня
     - max_done: максимальное количество задач, выполненных за один день
     - weekly: массив из 7 значений продуктивности (0.0-1.0) с понедельника по текущий день.
+    Поддерживает ETag / If-None-Match.
     """
+    @conditional_on_data_version('statistics', daily=True)
     def get(self, request, *args, **kwargs):
-        try:
-            token = get_token(request)
-            statistics = get_statistics(token)
-            return statistics_response(statistics)
-        except AuthenticationError as e:
-            # logger.error(f"Authentication error: {str(e)}")
-            return JsonResponse({'error': str(e)}, status=401)
-        except ValidationError as e:
-            # logger.error(f"Validation error: {str(e)}")
-            return JsonResponse({'error': str(e)}, status=400)
-        except Exception as e:
-            # logger.error(f"Unexpected error in StatisticsView: {str(e)}", exc_info=True)
-            return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        statistics = get_statistics(request.user)
+        return statistics_response(statistics)
+
+
+class StatisticsRangeView(APIView):
+    """
+    GET /statistics/range/?start=2025-01-01&end=2025-12-31&granularity=day|week|month
+    Выполненные задачи за промежуток (для тепловой карты за месяц или год) и серия дней с выполненными задачами:
+    - buckets: [{"start": "2025-01-01", "count": 3}, ...] - по одному элементу на день, неделю или месяц;
+    - total, max: сумма и максимум по buckets;
+    - streak: {"current": 4, "longest": 12, "last_day": "2025-05-20"}.
+    Поддерживает ETag / If-None-Match.
+    """
+    @conditional_on_data_version('statistics_range', daily=True)
+    def get(self, request, *args, **kwargs):
+        serializer = StatisticsRangeParametersSerializer(data=request.GET)
+        if not serializer.is_valid():
+            raise ValidationError(serializer.errors)
+        params = serializer.validated_data
+        statistics = get_statistics_range(request.user, params['start'], params['end'], params['granularity'])
+        return statistics_range_response(statistics)
@@ -1,13 +1,10 @@
 import json
-from django.http import JsonResponse, HttpResponse
-from rest_framework.exceptions import ValidationError
+from django.http import JsonResponse
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from taskbench.serializers.subtask_serializers import subtask_response
 from taskbench.services.subtask_service import create_subtask, update_subtask, delete_subtask
-from taskbench.services.user_service import get_token
-from taskbench.utils.exceptions import NotFound, AuthenticationError
 
 
 
@@ -18,22 +15,11 @@ class SubtaskCreateView(APIView):
         http://127.0.0.1:8000/subtasks/?task_id=3
         { "content": "Новая подзадача2", "is_done": false }
         """
-        try:
-            task_id = request.GET.get('task_id')
-            data = json.loads(request.body)
-            if not task_id:
-                return JsonResponse({'error': 'task_id parameter is required'}, status=400)
-            return subtask_response(create_subtask(token=get_token(request), task_id=task_id, data=data), status=201)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
-        except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON'}, status=400)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except NotFound as e:
-            return JsonResponse({'error': str(e)}, status=404)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        task_id = request.GET.get('task_id')
+        data = json.loads(request.body)
+        if not task_id:
+            return JsonResponse({'error': 'task_id parameter is required'}, status=400)
+        return subtask_response(create_subtask(user=request.user, task_id=task_id, data=data), status=201)
 
 
 
@@ -44,35 +30,13 @@ class SubtaskDetailView(APIView):
         http://127.0.0.1:8000/subtasks/4/
         { "content": "Обновленный текст подзадачи", "is_done": true }
         """
-        try:
-            token = get_token(request)
-            data = json.loads(request.body)
-            return subtask_response(update_subtask(token=token, subtask_id=subtask_id, data=data), 200)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
-        except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON'}, status=400)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except NotFound as e:
-            return JsonResponse({'error': str(e)}, status=404)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        data = json.loads(request.body)
+        return subtask_response(update_subtask(user=request.user, subtask_id=subtask_id, data=data), 200)
 
     def delete(self, request, subtask_id, *args, **kwargs):
         """
         DELETE /subtasks/{subtask_id}
         http://127.0.0.1:8000/subtasks/4/
         """
-        try:
-            token = get_token(request)
-            delete_subtask(token=token, subtask_id=subtask_id)
-            return Response(status=204)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except NotFound as e:
-            return JsonResponse({'error': str(e)}, status=404)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        delete_subtask(user=request.user, subtask_id=subtask_id)
+        return Response(status=204)
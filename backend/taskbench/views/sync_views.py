@@ -0,0 +1,19 @@
+from rest_framework.views import APIView
+
+from taskbench.serializers.sync_serializers import sync_response, decode_sync_cursor
+from taskbench.services.sync_service import get_changes
+
+
+class SyncView(APIView):
+    """
+    GET /sync/
+    GET /sync/?since=<cursor из предыдущего ответа>
+    Возвращает только задачи, подзадачи и категории, измененные после курсора, и список удаленных объектов
+    (выполненные задачи тоже считаются удаленными). Без since или с устаревшим курсором возвращает
+    все данные с "reset": true - клиент должен заменить ими локальную копию.
+    Строки могут повторяться между синхронизациями, клиент применяет их как upsert.
+    """
+    def get(self, request, *args, **kwargs):
+        since = request.GET.get('since')
+        changes = get_changes(request.user, decode_sync_cursor(since) if since else None)
+        return sync_response(changes)
@@ -1,18 +1,17 @@
 import json
 
-from django.http import JsonResponse
-from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 
-from ..serializers.task_serializers import task_list_response, task_response
-from ..services.task_service import get_task_list, create_task, complete_task, update_task
-from ..services.user_service import get_token, AuthenticationError
+from ..serializers.task_serializers import task_list_response, task_response, task_batch_response
+from ..services.task_service import get_task_list, create_task, create_tasks, complete_task, update_task
+from ..utils.decorators import conditional_on_data_version
 
 
 class TaskListView(APIView):
     """
     /tasks - GET, POST
     """
+    @conditional_on_data_version('tasks')
     def get(self, request, *args, **kwargs):
         """
         GET http://127.0.0.1:8000/tasks/
@@ -23,17 +22,12 @@ class TaskListView(APIView):
         GET http://127.0.0.1:8000/tasks/?before=2025-12-31T23:59:59Z
         GET http://127.0.0.1:8000/tasks/?after=2025-01-01T00:00:00Z&before=2025-12-31T23:59:59Z
         GET http://127.0.0.1:8000/tasks/?date=2025-05-01
+        GET http://127.0.0.1:8000/tasks/?sort_by=deadline&cursor=<X-Next-Cursor из предыдущего ответа>
+        Ответ содержит ETag; с заголовком If-None-Match без изменений возвращается 304.
         """
-        try:
-            token = get_token(request)
-            params = request.GET
-            return task_list_response(get_task_list(token=token, params=params))
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        params = request.GET
+        tasks, next_cursor = get_task_list(user=request.user, params=params)
+        return task_list_response(tasks, next_cursor)
 
     def post(self, request, *args, **kwargs):
         """
@@ -44,16 +38,28 @@ class TaskListView(APIView):
             "subtasks": [{ "content": "Собрать материалы" }, { "content": "Создать черновик" }]
         }
         """
-        try:
-            token = get_token(request)
-            data = json.loads(request.body)
-            return task_response(create_task(token=token, data=data), 201)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
-        except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        data = json.loads(request.body)
+        return task_response(create_task(user=request.user, data=data), 201)
+
+class TaskBatchView(APIView):
+    """
+    /tasks/batch - POST
+    """
+    def post(self, request, *args, **kwargs):
+        """
+        POST http://127.0.0.1:8000/tasks/batch/
+        {
+            "tasks": [
+                { "content": "Подготовить презентацию", "dpc": { "priority": 2 }, "subtasks": [{ "content": "Собрать материалы" }] },
+                { "content": "Купить продукты", "dpc": { "deadline": "2025-05-25T14:00:00Z", "category_id": 3 } }
+            ]
+        }
+        Все задачи создаются в одной транзакции: при ошибке в любой из них не создается ни одна.
+        """
+        data = json.loads(request.body)
+        items = data.get('tasks') if isinstance(data, dict) else data
+        return task_batch_response(create_tasks(user=request.user, items=items), 201)
+
 
 class TaskDetailView(APIView):
     """
@@ -63,13 +69,7 @@ class TaskDetailView(APIView):
         """
         DELETE http://127.0.0.1:8000/tasks/2/
         """
-        try:
-            token = get_token(request)
-            return task_response(complete_task(token=token, task_id=task_id), 200)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
+        return task_response(complete_task(user=request.user, task_id=task_id), 200)
 
     def patch(self, request, task_id, *args, **kwargs):
         """
@@ -79,15 +79,5 @@ class TaskDetailView(APIView):
           "dpc": { "deadline": "2025-04-30T18:00:00Z", "priority": 3, "category_id": 5 }
         }
         """
-        try:
-            token = get_token(request)
-            data = json.loads(request.body)
-            return task_response(update_task(token=token, task_id=task_id, data=data), 200)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
-        except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON'}, status=400)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        data = json.loads(request.body)
+        return task_response(update_task(user=request.user, task_id=task_id, data=data), 200)
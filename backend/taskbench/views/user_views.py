@@ -1,16 +1,17 @@
 import json
 
 from django.http import JsonResponse
-from pydantic import ValidationError
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from ..serializers.user_serializers import user_response
-from ..services.user_service import get_token, register_user, login_user, token_refresh, delete_user, change_password, \
-    AuthenticationError
+from ..services.user_service import register_user, login_user, token_refresh, delete_user, change_password
 
 
 class RegisterView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
         try:
@@ -21,6 +22,8 @@ class RegisterView(APIView):
 
 
 class LoginView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
         try:
@@ -34,28 +37,21 @@ class LoginView(APIView):
 class DeleteUserView(APIView):
 
     def delete(self, request, *args, **kwargs):
-        token = get_token(request)
-        try:
-            delete_user(token)
-            return Response(status=204)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
+        delete_user(request.user)
+        return Response(status=204)
 
 
 class ChangePasswordView(APIView):
 
     def patch(self, request, *args, **kwargs):
-        try:
-            data = json.loads(request.body)
-            change_password(token=get_token(request), data=data)
-            return Response(status=204)
-        except AuthenticationError as e:
-            return JsonResponse({'error': str(e)}, status=401)
-        except ValidationError as e:
-            return JsonResponse({'error': str(e)}, status=400)
+        data = json.loads(request.body)
+        change_password(user=request.user, data=data)
+        return Response(status=204)
 
 
 class TokenRefreshView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
         try: